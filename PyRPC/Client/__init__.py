@@ -1,4 +1,6 @@
 """ RPC 客户端模块 """
-from .example import RPCClient , AsyncRPCClient
+from .example import RPCClient
+from .asyncclient import AsyncRPCClient
+from .pool import RPCClientPool
 
-__all__ = ["RPCClient", "AsyncRPCClient"]
\ No newline at end of file
+__all__ = ["RPCClient", "AsyncRPCClient", "RPCClientPool"]
\ No newline at end of file
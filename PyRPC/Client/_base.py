@@ -0,0 +1,213 @@
+
+from ..Models import RpcRequest, CallType, MethodType, CallBody , RpcBatchRequest , RpcBatchResponse , RpcResponse , ErrorCode , IdentityClientCard
+from ..Interfaces import IRPCClient , IRPCCodec
+from ..Utils import ExtractException
+from ..Codecs import codecRegistry , DEFAULT_ATTACHMENT_THRESHOLD , DEFAULT_COMPRESSION_THRESHOLD
+from ..Utils.cache import ResultCache
+from .exceptions import RPCError , RPCOverloadedError , RPCRateLimitedError , RPCTimeoutError
+import itertools
+import random
+import time
+
+_RETRYABLE = (ErrorCode.OVERLOADED, ErrorCode.RATE_LIMITED) # 等待 retryAfter 之后可以重试的错误
+
+class RPCClientBase(IRPCClient):
+    """ 同步客户端和异步客户端共用的部分: 请求构建、请求ID和异常回调 """
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, codecs: list[str] | None = None, compression: str | None = None) -> None:
+        self.ws = None
+        self.connected = False
+        self.host = host
+        self.port = port
+        self.codecs = codecs # 按优先级排列的编解码器, 例如 ["msgpack", "json"], None 表示不协商直接使用 JSON
+        self.compression = compression # 应用层压缩算法, 例如 "zlib", 服务器不支持时退回不压缩
+        self.compressionThreshold = DEFAULT_COMPRESSION_THRESHOLD # 超过这个大小的帧才压缩
+        self.codec: IRPCCodec = codecRegistry.get(codecRegistry.default)
+        self._requestIds = itertools.count(1) # 请求ID生成器, 用于匹配乱序返回的响应
+        self.streamWindow = 64 # 流式调用的信用窗口, 本地最多缓存这么多个未消费的数据块
+        self.attachmentThreshold = DEFAULT_ATTACHMENT_THRESHOLD # 二进制编解码器中超过这个大小的 bytes 作为附件帧发送
+        self.timeout: float | None = None # 每个调用的期限(秒), 随请求发送给服务器, 超过后服务器停止执行, None 表示不限制
+        self.timeoutGrace = 1.0 # 超过期限后再等待服务器的超时响应多久, 仍然没有响应时在本地抛出 RPCTimeoutError
+        self.resumeToken: str | None = None # 认证成功后服务器签发的会话恢复令牌, 重连时用它跳过完整的认证
+        self.overloadRetries = 3 # 服务器过载或限流时最多重试几次, 每次按服务器建议的 retryAfter 等待
+        self.maxRetryAfter = 10.0 # 单次重试等待的上限(秒)
+        self.catalogueTTL = 30.0 # 可调用对象目录在本地的有效时间(秒), 过期后用 ETag 向服务器校验
+        self.httpTimeout = 10.0 # 没有设置 timeout 时, 获取目录的 HTTP 请求的超时时间(秒)
+        self._catalogue: list | None = None
+        self._catalogueIndex: dict[str, dict] = {}
+        self._catalogueETag: str | None = None
+        self._catalogueAt = 0.0
+        self._resultCacheOptions: tuple[int, float | None] | None = None # 本地结果缓存 (条目数, ttl), None 表示关闭
+        self._resultCaches: dict[str, ResultCache | None] = {}
+
+    def _subprotocols(self) -> list[str] | None:
+        """ 握手时提供的子协议 """
+        if self.compression is not None:
+            return codecRegistry.subprotocols(self.codecs or [codecRegistry.default], self.compression)
+        return codecRegistry.subprotocols(self.codecs) if self.codecs else None
+
+    def _negotiated(self, subprotocol: str | None) -> IRPCCodec:
+        """ 根据服务器回应的子协议取得编解码器 """
+        return codecRegistry.fromSubprotocol(subprotocol, self.compressionThreshold)
+
+    def _catalogueUrl(self) -> str:
+        return f"http://{self.host}:{self.port}/rpc/callables"
+
+    def _catalogueFresh(self) -> bool:
+        return self._catalogue is not None and time.monotonic() - self._catalogueAt < self.catalogueTTL
+
+    def _catalogueTimeout(self) -> float:
+        """ 获取目录的 HTTP 请求的超时时间 """
+        return self.timeout if self.timeout is not None else self.httpTimeout
+
+    def _catalogueHeaders(self, userAgent: str) -> dict:
+        headers = {"User-Agent": userAgent}
+        if self._catalogueETag is not None:
+            headers["If-None-Match"] = self._catalogueETag
+        return headers
+
+    def _updateCatalogue(self, status: int, etag: str | None, body) -> list:
+        """ 处理目录请求的响应, 304 表示本地缓存仍然有效 """
+        self._catalogueAt = time.monotonic()
+        if status == 304 and self._catalogue is not None:
+            return self._catalogue
+        if etag != self._catalogueETag:
+            self._resultCaches = {} # 服务器上的可调用对象变了, 本地结果缓存作废
+        self._catalogue, self._catalogueETag = body, etag
+        self._catalogueIndex = {info["callName"]: info for info in body} if isinstance(body, list) else {}
+        return body
+
+    def enableResultCache(self, maxEntries: int = 1024, ttl: float | None = 60.0) -> None:
+        """
+        开启本地结果缓存, 只缓存服务器标记为可缓存 (cacheable) 或幂等 (idempotent) 的调用,
+        过期时间取本地 ttl 和服务器缓存 ttl 中较小的一个。出错的调用不缓存。
+        """
+        self._resultCacheOptions = (maxEntries, ttl)
+        self._resultCaches = {}
+
+    def disableResultCache(self) -> None:
+        self._resultCacheOptions = None
+        self._resultCaches = {}
+
+    def _resultCacheFor(self, callItem: str) -> ResultCache | None:
+        """ 取得某个调用的本地结果缓存, 不可缓存时返回 None (需要先加载目录) """
+        if callItem in self._resultCaches:
+            return self._resultCaches[callItem]
+        info = self._catalogueIndex.get(callItem)
+        cache = None
+        if info is not None and (info.get("cacheable") or info.get("idempotent")):
+            maxEntries, ttl = self._resultCacheOptions
+            serverTTL = info.get("cacheTTL") if info.get("cacheable") else None
+            if serverTTL is not None:
+                ttl = serverTTL if ttl is None else min(ttl, serverTTL)
+            cache = ResultCache(ttl, maxEntries)
+        self._resultCaches[callItem] = cache
+        return cache
+
+    def _buildRequest(self, callItem: str, methodType: MethodType, callType: CallType | None, *args, **kwargs) -> RpcRequest:
+        """ 构建 RPC 请求 """
+        callBody = CallBody(callitem=callItem, args=args, kwargs=kwargs)
+        req = RpcRequest(callType=callType, methodType=methodType, callbody=callBody, timeout=self.timeout)
+        return req
+
+    def _buildStream(self, callItem: str, *args, **kwargs) -> RpcRequest:
+        """ 构建流式请求 """
+        req = self._buildRequest(callItem, MethodType.CALLABLE, None, *args, **kwargs)
+        req.stream = True
+        req.window = self.streamWindow
+        return req
+
+    def _buildUpload(self, callItem: str, stream: bool, *args, **kwargs) -> RpcRequest:
+        """ 构建上传流的请求, stream 为 True 时结果也按流返回 (双向流) """
+        req = self._buildStream(callItem, *args, **kwargs) if stream else self._buildRequest(callItem, MethodType.CALLABLE, None, *args, **kwargs)
+        req.upload = True
+        req.requestId = next(self._requestIds) # 提前分配请求ID, 以便在发送请求之前登记信用
+        return req
+
+    def _checkStreamEnd(self, message) -> None:
+        """ 流结束时检查错误, 连接断开或调用出错都会抛出异常 """
+        if isinstance(message, Exception):
+            raise message
+        if message.IsError:
+            self.exceptionBack(message.error)
+            code = getattr(message, "code", None)
+            if code == ErrorCode.OVERLOADED:
+                raise RPCOverloadedError(message.error, message.retryAfter)
+            if code == ErrorCode.RATE_LIMITED:
+                raise RPCRateLimitedError(message.error, message.retryAfter)
+            if code == ErrorCode.DEADLINE_EXCEEDED:
+                raise RPCTimeoutError(message.error)
+            raise RPCError(message.error)
+
+    def _retryDelay(self, response: RpcResponse | RpcBatchResponse, attempt: int, deadline: float | None = None) -> float | None:
+        """ 服务器过载或限流时计算重试前的等待时间, 不需要重试或等待会超过期限时返回 None """
+        results = response.results if isinstance(response, RpcBatchResponse) else (response,)
+        if attempt >= self.overloadRetries or not results or any(item.code not in _RETRYABLE for item in results):
+            return None
+        retryAfter = max(item.retryAfter or 0.0 for item in results)
+        delay = min(retryAfter, self.maxRetryAfter) * random.uniform(1.0, 1.2) # 加入抖动, 避免所有客户端同时重试
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _deadline(self, req: RpcRequest | RpcBatchRequest) -> float | None:
+        """ 调用在本地的截止时间 (time.monotonic) """
+        timeout = getattr(req, "timeout", None)
+        return None if timeout is None else time.monotonic() + timeout
+
+    def _wait(self, req: RpcRequest | RpcBatchRequest, deadline: float | None) -> float | None:
+        """ 重新发送之前更新请求的剩余期限, 返回本地最多等待响应的时间 """
+        if deadline is None:
+            return None
+        remaining = max(0.0, deadline - time.monotonic())
+        req.timeout = remaining
+        return remaining + self.timeoutGrace
+
+    def _remaining(self, deadline: float | None) -> float | None:
+        """ 不重新发送请求时, 本地还要等待响应多久 """
+        return None if deadline is None else max(0.0, deadline - time.monotonic()) + self.timeoutGrace
+
+    def _buildBatch(self, calls: list, parallel: bool = False) -> RpcBatchRequest:
+        """
+        构建批量请求, 每个调用可以是 CallBody, 也可以是 (调用名, 参数[, 关键字参数]) 元组:
+
+        ```
+        client.batch([("add", (1, 2)), ("add", (3, 4)), CallBody(callitem="echo", kwargs={"x": 1})])
+        ```
+        """
+        bodies = []
+        for call in calls:
+            if not isinstance(call, CallBody):
+                callItem, args, *rest = call
+                call = CallBody(callitem=callItem, args=tuple(args), kwargs=rest[0] if rest else {})
+            bodies.append(call)
+        return RpcBatchRequest(calls=bodies, parallel=parallel)
+
+    def _unpackBatch(self, response: RpcBatchResponse) -> list[RpcResponse]:
+        """ 把批量响应拆成与调用顺序一致的 RpcResponse 列表 """
+        responses = []
+        for item in response.results:
+            if item.IsError:
+                self.exceptionBack(item.error)
+            responses.append(RpcResponse.model_construct(protocol=response.protocol, requestId=response.requestId,
+                                                         result=item.result, error=item.error, IsError=item.IsError,
+                                                         code=item.code, retryAfter=item.retryAfter))
+        return responses
+
+    def _resumeCard(self) -> IdentityClientCard:
+        return IdentityClientCard(serverAllowed=True, token=self.resumeToken, mode="resume")
+
+    def _updateSession(self, result: dict) -> dict:
+        """ 记录认证结果中的会话恢复令牌, 恢复令牌只能使用一次 """
+        self.resumeToken = result.get("resume") if isinstance(result, dict) else None
+        return result
+
+    def exceptionBack(self, e: Exception | str) -> None:
+        """ 处理 RPC 异常 """
+        if isinstance(e, str):
+            err_info = "Call successed but got an error: \n"
+            err_info += e
+            print(err_info)
+            return
+        else:
+            err_info = ExtractException(type(e), e, e.__traceback__)
+            print(err_info)
@@ -0,0 +1,412 @@
+
+from ..Models import RpcRequest, CallType, MethodType, RpcResponse , AuthRegisterPayload , IdentityClientCard , ResponseAdapter
+from ..Models import RpcStreamChunk , RpcStreamEnd , RpcStreamCredit , RpcBatchRequest , RpcBatchResponse , RpcCancel
+from ..Utils.cache import cacheKey
+from ..Utils import ExtractException , CreditGate
+from ..Codecs import detachAttachments , attachAttachments
+from ._base import RPCClientBase
+from .exceptions import RPCConnectionError , RPCError , RPCTimeoutError
+from websockets.asyncio.client import connect as wsConnect , ClientConnection
+from websockets.exceptions import WebSocketException
+from typing import AsyncIterator , AsyncIterable , Iterable
+import asyncio
+import requests
+
+class AsyncRPCClient(RPCClientBase):
+    """
+    异步 RPC 客户端, 基于 websockets 的原生 asyncio 实现。
+    所有调用共享一个连接, 由读取任务按请求ID分发响应, 每个在途调用只是一个 Future:
+
+    ```
+    async with AsyncRPCClient("127.0.0.1", 8000) as client:
+        results = await asyncio.gather(*(client("add", i, i) for i in range(1000)))
+    ```
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, codecs: list[str] | None = None, compression: str | None = None,
+                 perMessageDeflate: bool = False):
+        super().__init__(host, port, codecs, compression)
+        self.perMessageDeflate = perMessageDeflate # WebSocket 层的 permessage-deflate, 会压缩所有帧, 需要服务器同时开启
+        self.ws: ClientConnection | None = None
+        self._pending: dict[int, asyncio.Future] = {} # 等待响应的请求
+        self._streams: dict[int, asyncio.Queue] = {} # 正在接收的流
+        self._uploads: dict[int, CreditGate] = {} # 正在上传的流, 由服务器授予信用
+        self._reader: asyncio.Task | None = None
+        self._sendLock: asyncio.Lock | None = None
+        self._connectLock: asyncio.Lock | None = None
+
+    async def connect(self, host: str | None = None, port: int | None = None) -> bool:
+        """ 连接到 RPC 服务器 """
+        self.host, self.port = host or self.host, port or self.port
+        if self.ws is not None:
+            self._failPending(RPCConnectionError("Connection was replaced by a reconnect"))
+            await self.ws.close()
+        try:
+            self.ws = await wsConnect(f"ws://{self.host}:{self.port}/ws/rpc", subprotocols=self._subprotocols(), max_size=None,
+                                      compression="deflate" if self.perMessageDeflate else None)
+            self.codec = self._negotiated(self.ws.subprotocol)
+            self.connected = True
+            self._reader = None
+            self._sendLock = asyncio.Lock()
+            print("Connected to RPC server")
+        except (WebSocketException, OSError, asyncio.TimeoutError) as e:
+            print(f"Connection failed: {e}")
+            self.connected = False
+        return self.connected
+
+    async def _ensureConnected(self) -> None:
+        """ 第一次使用时再建立连接, 构造函数中不能等待 """
+        if self.ws is not None:
+            if not self.IsConnected():
+                raise RPCConnectionError("Not connected to the RPC server")
+            return
+        if self._connectLock is None:
+            self._connectLock = asyncio.Lock()
+        async with self._connectLock:
+            if self.ws is None and not await self.connect():
+                raise RPCConnectionError("Not connected to the RPC server")
+
+    def IsConnected(self) -> bool:
+        """ 检测是否连接到 RPC 服务器 """
+        return self.connected and self.ws is not None
+
+    async def _sendMessage(self, model) -> None:
+        """ 编码并发送消息, 大的 bytes 作为附件帧紧随其后发送 """
+        model, buffers = detachAttachments(model, self.attachmentThreshold, self.codec.nativeBytes)
+        data = self.codec.encode(model)
+        async with self._sendLock: # 保证附件帧紧跟在消息之后
+            await self.ws.send(data)
+            for buffer in buffers:
+                await self.ws.send(buffer)
+
+    async def registerUser(self, payload: AuthRegisterPayload) -> IdentityClientCard:
+        """ 发送注册请求 """
+        await self._ensureConnected()
+        self._checkHandshakeAllowed()
+        await self._sendMessage(payload)
+        return self.codec.decode(await self.ws.recv(), IdentityClientCard)
+
+    async def authenticate(self, payload: IdentityClientCard) -> dict:
+        """ 发送身份验证请求 """
+        await self._ensureConnected()
+        self._checkHandshakeAllowed()
+        await self._sendMessage(payload)
+        return self._updateSession(self.codec.loads(await self.ws.recv()))
+
+    async def resume(self) -> dict:
+        """ 用会话恢复令牌重新认证新连接, 会话过期时返回 {"status": "expired"}, 连接仍然可以用 authenticate 认证 """
+        if self.resumeToken is None:
+            return {"status": "expired", "message": "No session to resume"}
+        return await self.authenticate(self._resumeCard())
+
+    async def getAllCallables(self, refresh: bool = False) -> list:
+        """ 异步获取 RPC 所有可调用服务, 本地目录在 catalogueTTL 内直接返回, 过期后用 ETag 校验 """
+        if not refresh and self._catalogueFresh():
+            return self._catalogue
+        response = await asyncio.to_thread(requests.get, self._catalogueUrl(), headers=self._catalogueHeaders("Python-Async-RPC-Client"),
+                                           timeout=self._catalogueTimeout())
+        return self._updateCatalogue(response.status_code, response.headers.get("ETag"), None if response.status_code == 304 else response.json())
+
+    def _checkHandshakeAllowed(self) -> None:
+        """ 握手 (注册/认证) 必须在第一次调用之前完成, 此后连接上的所有帧都由读取任务接管 """
+        if self._reader is not None:
+            raise RPCError("Handshake messages must be sent before any RPC call on this connection")
+
+    async def _readLoop(self, ws: ClientConnection) -> None:
+        """ 持续读取响应, 按请求ID唤醒对应的等待者 """
+        error = "Connection closed by server"
+        try:
+            async for frame in ws:
+                rpcResponse = self.codec.decode(frame, ResponseAdapter)
+                count = getattr(rpcResponse, "attachments", 0)
+                if count: # 附件帧紧随消息到达, 直接包装为 memoryview 不再复制
+                    attachAttachments(rpcResponse, [memoryview(await ws.recv()) for _ in range(count)])
+                if isinstance(rpcResponse, RpcStreamCredit):
+                    self._grant(rpcResponse)
+                    continue
+                if not isinstance(rpcResponse, RpcStreamChunk):
+                    self._endUpload(rpcResponse.requestId) # 调用已经结束, 不再需要上传
+                stream = self._streams.get(rpcResponse.requestId)
+                if stream is not None:
+                    stream.put_nowait(rpcResponse) # 服务器按信用发送, 队列长度不会超过窗口
+                    continue
+                future = self._pending.pop(rpcResponse.requestId, None)
+                if future is not None and not future.done():
+                    future.set_result(rpcResponse)
+        except Exception as e:
+            error = f"Connection lost: {e}"
+        if self.ws is ws: # 重连之后旧的读取任务不再影响新连接
+            self.connected = False
+            self._failPending(RPCConnectionError(error))
+
+    def _failPending(self, exc: Exception) -> None:
+        """ 连接断开时通知所有等待者 """
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        for stream in self._streams.values():
+            stream.put_nowait(exc)
+        uploads, self._uploads = self._uploads, {}
+        for gate in uploads.values():
+            gate.close()
+
+    async def _send(self, req: RpcRequest, waiters: dict, waiter) -> None:
+        """ 分配请求ID, 登记等待者并发送请求 """
+        await self._ensureConnected()
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._readLoop(self.ws))
+        if req.requestId is None:
+            req.requestId = next(self._requestIds)
+        waiters[req.requestId] = waiter
+        try:
+            await self._sendMessage(req)
+        except WebSocketException as e:
+            waiters.pop(req.requestId, None)
+            raise RPCConnectionError(f"Failed to send request: {e}") from e
+
+    async def _submit(self, req: RpcRequest) -> asyncio.Future:
+        """ 发送请求但不等待响应, 返回一个在响应到达时完成的 Future """
+        future = asyncio.get_running_loop().create_future()
+        await self._send(req, self._pending, future)
+        return future
+
+    async def _stream(self, req: RpcRequest) -> AsyncIterator:
+        """ 发送流式请求并接收结果 """
+        items = asyncio.Queue()
+        await self._send(req, self._streams, items)
+        async for item in self._receiveStream(req, items):
+            yield item
+
+    async def _receiveStream(self, req: RpcRequest, items: asyncio.Queue) -> AsyncIterator:
+        """ 接收流中的数据块, 每消费半个窗口就向服务器授予同样多的信用 """
+        every = max(1, req.window // 2)
+        consumed, ended = 0, False
+        try:
+            while True:
+                message = await items.get()
+                if isinstance(message, RpcStreamChunk):
+                    yield message.data
+                    consumed += 1
+                    if consumed >= every:
+                        await self._sendMessage(RpcStreamCredit(requestId=req.requestId, credit=consumed))
+                        consumed = 0
+                    continue
+                ended = True
+                self._checkStreamEnd(message)
+                if isinstance(message, RpcResponse): # 不是生成器函数, 只有一个结果
+                    yield message.result
+                return
+        finally:
+            self._streams.pop(req.requestId, None)
+            if not ended and self.IsConnected(): # 提前退出迭代, 通知服务器停止发送
+                try:
+                    await self._sendMessage(RpcStreamCredit(requestId=req.requestId, close=True))
+                except WebSocketException:
+                    pass
+
+    def _grant(self, credit: RpcStreamCredit) -> None:
+        """ 服务器授予上传信用 """
+        gate = self._uploads.get(credit.requestId)
+        if gate is None:
+            return
+        if credit.close:
+            gate.close()
+        else:
+            gate.grant(credit.credit)
+
+    def _endUpload(self, requestId: int | None) -> None:
+        gate = self._uploads.pop(requestId, None)
+        if gate is not None:
+            gate.close()
+
+    async def _upload(self, req: RpcRequest, items: Iterable | AsyncIterable, gate: CreditGate) -> None:
+        """ 按信用逐块上传, 最后发送结束帧; 服务器提前结束调用时停止上传 """
+        count = 0
+        if not hasattr(items, "__aiter__"):
+            items = self._aiter(items)
+        try:
+            async for item in items:
+                if not await gate.acquire():
+                    return
+                await self._sendMessage(RpcStreamChunk(requestId=req.requestId, data=item))
+                count += 1
+            await self._sendMessage(RpcStreamEnd(requestId=req.requestId, count=count))
+        except WebSocketException as e:
+            raise RPCConnectionError(f"Failed to upload stream: {e}") from e
+        except Exception as e:
+            # 本地产生数据时出错, 通知服务器中止这个流
+            await self._sendMessage(RpcStreamEnd(requestId=req.requestId, count=count, error=f"{type(e).__name__}: {e}", IsError=True))
+            raise
+        finally:
+            self._endUpload(req.requestId)
+
+    @staticmethod
+    async def _aiter(items: Iterable) -> AsyncIterator:
+        for item in items:
+            yield item
+
+    async def _call(self, req: RpcRequest | RpcBatchRequest) -> RpcResponse | RpcBatchResponse:
+        """ 调用 RPC 服务的内部方法, 服务器过载时按 retryAfter 等待后重试 """
+        attempt, deadline = 0, self._deadline(req)
+        while True:
+            wait = self._wait(req, deadline)
+            future = await self._submit(req)
+            try:
+                rpcResponse = await asyncio.wait_for(future, wait)
+            except TimeoutError:
+                await self._abandon(req.requestId)
+                raise RPCTimeoutError(f"No response for request {req.requestId} within {req.timeout:.3f}s") from None
+            except asyncio.CancelledError: # 调用方放弃了等待, 服务器也停止执行
+                await self._abandon(req.requestId)
+                raise
+            delay = self._retryDelay(rpcResponse, attempt, deadline)
+            if delay is None:
+                break
+            attempt += 1
+            await asyncio.sleep(delay)
+            req.requestId = None # 重新分配请求ID
+        if isinstance(rpcResponse, RpcBatchResponse):
+            return rpcResponse
+        if rpcResponse.IsError:
+            self.exceptionBack(rpcResponse.error)
+        return rpcResponse
+
+    async def _abandon(self, requestId: int | None) -> None:
+        """ 不再等待某个调用, 通知服务器取消它 """
+        self._pending.pop(requestId, None)
+        try:
+            await self._sendMessage(RpcCancel(requestId=requestId))
+        except (WebSocketException, RuntimeError):
+            pass
+
+    async def call(self, call_item: str, method_type: MethodType, call_type: CallType | None, *args, **kwargs) -> RpcResponse:
+        """ 异步调用 RPC 服务, 开启本地结果缓存时可缓存的调用直接返回缓存的结果 """
+        req = self._buildRequest(call_item, method_type, call_type, *args, **kwargs)
+        if self._resultCacheOptions is None:
+            return await self._call(req)
+        if not self._catalogueFresh():
+            await self.getAllCallables()
+        cache = self._resultCacheFor(call_item)
+        key = cacheKey(req.callbody.args, req.callbody.kwargs) if cache is not None else None
+        if key is None:
+            return await self._call(req)
+        hit, rpcResponse = cache.get(key)
+        if hit:
+            cache.hits += 1
+            return rpcResponse.model_copy(deep=True) # 调用方修改结果不会影响缓存
+        cache.misses += 1
+        rpcResponse = await self._call(req)
+        if not rpcResponse.IsError:
+            cache.put(key, rpcResponse.model_copy(deep=True))
+        return rpcResponse
+
+    async def batch(self, calls: list, parallel: bool = False) -> list[RpcResponse]:
+        """ 异步批量调用, 所有调用在一帧中发送, 结果在一帧中返回 """
+        return self._unpackBatch(await self._call(self._buildBatch(calls, parallel)))
+
+    def stream(self, call_item: str, *args, **kwargs) -> AsyncIterator:
+        """
+        流式调用生成器函数, 服务器按消费速度逐块发送结果:
+
+        ```
+        async for row in client.stream("query", "select * from logs"):
+            print(row)
+        ```
+        """
+        return self._stream(self._buildStream(call_item, *args, **kwargs))
+
+    async def clientStream(self, call_item: str, items: Iterable | AsyncIterable, *args, **kwargs) -> RpcResponse:
+        """
+        客户端流式调用, 逐块上传 items (可以是异步迭代器), 服务端函数的第一个参数是上传的流:
+
+        ```
+        response = await client.clientStream("ingest", readRows())
+        ```
+        """
+        req = self._buildUpload(call_item, False, *args, **kwargs)
+        self._uploads[req.requestId] = gate = CreditGate()
+        deadline = self._deadline(req)
+        try:
+            future = await self._submit(req)
+            await self._upload(req, items, gate)
+            rpcResponse = await asyncio.wait_for(future, self._remaining(deadline))
+        except TimeoutError:
+            self._endUpload(req.requestId)
+            await self._abandon(req.requestId)
+            raise RPCTimeoutError(f"No response for request {req.requestId} before its deadline") from None
+        except BaseException:
+            self._endUpload(req.requestId)
+            self._pending.pop(req.requestId, None)
+            raise
+        if rpcResponse.IsError:
+            self.exceptionBack(rpcResponse.error)
+        return rpcResponse
+
+    async def bidiStream(self, call_item: str, items: Iterable | AsyncIterable, *args, **kwargs) -> AsyncIterator:
+        """
+        双向流式调用, 在后台任务中上传 items, 同时迭代服务端生成器返回的结果:
+
+        ```
+        async for result in client.bidiStream("translate", sentences()):
+            print(result)
+        ```
+        """
+        req = self._buildUpload(call_item, True, *args, **kwargs)
+        self._uploads[req.requestId] = gate = CreditGate()
+        results = asyncio.Queue()
+        try:
+            await self._send(req, self._streams, results)
+        except BaseException:
+            self._endUpload(req.requestId)
+            raise
+        # 上传失败会通过结束帧通知服务器, 错误由结果流返回
+        uploader = asyncio.create_task(self._upload(req, items, gate))
+        uploader.add_done_callback(lambda task: task.cancelled() or task.exception())
+        try:
+            async for item in self._receiveStream(req, results):
+                yield item
+        finally:
+            uploader.cancel()
+
+    async def ping(self, timeout: float = 5.0) -> bool:
+        """ 异步心跳检测 """
+        if not self.IsConnected():
+            return False
+        try:
+            pong = await self.ws.ping()
+            await asyncio.wait_for(pong, timeout)
+            return True
+        except (WebSocketException, asyncio.TimeoutError, OSError):
+            return False
+
+    async def retry(self, times: int, delay: float = 0.2) -> bool:
+        """ 异步重试机制 """
+        for attempt in range(times):
+            if await self.connect(self.host, self.port):
+                print(f"Reconnected on attempt {attempt + 1}")
+                return True
+            await asyncio.sleep(delay * (2 ** attempt))
+        return False
+
+    async def close(self, status: int = 1000, reason: str = "") -> None:
+        """ 关闭 RPC 连接 """
+        if self.ws is not None:
+            await self.ws.close(code=status, reason=reason)
+            if self._reader is not None:
+                await asyncio.gather(self._reader, return_exceptions=True)
+            self.connected = False
+            print("Connection closed")
+
+    async def __call__(self, item: str, *args, **kwargs) -> RpcResponse:
+        """ 异步简化调用 RPC 服务 """
+        return await self.call(item, MethodType.CALLABLE, None, *args, **kwargs)
+
+    async def __aenter__(self) -> "AsyncRPCClient":
+        await self._ensureConnected()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if (exc_type is not None) and (exc_val is not None) and (exc_tb is not None):
+            err_stack = ExtractException(exc_type, exc_val, exc_tb)
+            self.exceptionBack(err_stack)
+        await self.close(1000, "Async RPC client wants to close the connection.")
@@ -1,36 +1,56 @@
 
-from ..Models import RpcRequest, CallType, MethodType, CallBody , RpcResponse , AuthRegisterPayload , IdentityClientCard
-from ..Interfaces import IRPCClient
-from ..Utils import ExtractException
+from ..Models import RpcRequest, CallType, MethodType, RpcResponse , AuthRegisterPayload , IdentityClientCard , ResponseAdapter
+from ..Models import RpcStreamChunk , RpcStreamEnd , RpcStreamCredit , RpcBatchRequest , RpcBatchResponse , RpcCancel
+from ..Utils.cache import cacheKey
+from ..Utils import ExtractException , ThreadCreditGate
+from ..Codecs import detachAttachments , attachAttachments
+from ._base import RPCClientBase
 import websocket
-import asyncio
-import json
 import requests
-from .exceptions import RPCConnectionError
+import threading
+import queue
+import time
+from concurrent.futures import Future , TimeoutError as FutureTimeoutError
+from typing import Iterator , Iterable
+from .exceptions import RPCConnectionError , RPCError , RPCTimeoutError
 
-class RPCClient(IRPCClient):
-    def __init__(self, host: str = "127.0.0.1", port: int = 8000):
-        self.ws = None
-        self.connected = False
+class RPCClient(RPCClientBase):
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, codecs: list[str] | None = None, compression: str | None = None):
+        super().__init__(host, port, codecs, compression)
+        self._pending: dict[int, Future] = {} # 等待响应的请求
+        self._streams: dict[int, queue.Queue] = {} # 正在接收的流
+        self._uploads: dict[int, ThreadCreditGate] = {} # 正在上传的流, 由服务器授予信用
+        self._pendingLock = threading.Lock()
+        self._sendLock = threading.Lock() # 保证附件帧紧跟在消息之后, 不被其他线程的帧插入
+        self._cacheLock = threading.RLock() # 保护目录和本地结果缓存
+        self._reader: threading.Thread | None = None
         self.connect(host, port)
 
-    def connect(self, host: str, port: int) -> None:
+    def connect(self, host: str, port: int) -> bool:
         """ 连接到 RPC 服务器 """
+        self.host, self.port = host, port
+        if self.ws is not None and self.ws.sock is not None:
+            self._failPending(RPCConnectionError("Connection was replaced by a reconnect"))
+            self.ws.shutdown() # 重连时丢弃旧连接, 读取线程会随之退出
         try:
-            self.ws = websocket.create_connection(f"ws://{host}:{port}/ws/rpc")
+            self.ws = websocket.create_connection(f"ws://{host}:{port}/ws/rpc", enable_multithread=True, subprotocols=self._subprotocols())
+            self.codec = self._negotiated(self.ws.getsubprotocol())
             self.connected = True
+            self._reader = None
             print("Connected to RPC server")
-        except websocket.WebSocketException as e:
+        except (websocket.WebSocketException, OSError) as e:
             print(f"Connection failed: {e}")
             self.connected = False
+        return self.connected
 
     def registerUser(self, payload: AuthRegisterPayload) -> IdentityClientCard:
         """ 发送注册请求 """
         if not self.IsConnected():
             raise RPCConnectionError("Not connected to the RPC server")
-        self.ws.send(json.dumps(payload.model_dump_json()))
+        self._checkHandshakeAllowed()
+        self._sendMessage(payload)
         resp = self.ws.recv()
-        card = IdentityClientCard(**json.loads(resp))
+        card = self.codec.decode(resp, IdentityClientCard)
         return card
     
     def authenticate(self, payload: IdentityClientCard) -> dict:
@@ -38,93 +58,377 @@ class RPCClient(IRPCClient):
         result = {}
         if not self.IsConnected():
             raise RPCConnectionError("Not connected to the RPC server")
-        self.ws.send(json.dumps(payload.model_dump_json()))
+        self._checkHandshakeAllowed()
+        self._sendMessage(payload)
         resp = self.ws.recv()
-        result = json.loads(resp)
-        return result
+        result = self.codec.loads(resp)
+        return self._updateSession(result)
+
+    def resume(self) -> dict:
+        """ 用会话恢复令牌重新认证新连接, 会话过期时返回 {"status": "expired"}, 连接仍然可以用 authenticate 认证 """
+        if self.resumeToken is None:
+            return {"status": "expired", "message": "No session to resume"}
+        return self.authenticate(self._resumeCard())
 
-    def getAllCallables(self) -> list:
-        """ 获取 RPC 所有可调用服务 """
+    def getAllCallables(self, refresh: bool = False) -> list:
+        """ 获取 RPC 所有可调用服务, 本地目录在 catalogueTTL 内直接返回, 过期后用 ETag 校验 """
         if not self.IsConnected():
             raise RPCConnectionError("Not connected to the RPC server")
-        
-        Infos = requests.get("http://127.0.0.1:8000/rpc/callables/", headers={"User-Agent": "Python-RPC-Client"})
-        return Infos.json()
-
-    def _buildRequest(self, callItem: str, methodType: MethodType, callType: CallType, *args, **kwargs) -> RpcRequest:
-        """ 构建 RPC 请求 """
-        callBody = CallBody(callitem=callItem, args=args, kwargs=kwargs)
-        req = RpcRequest(callType=callType, methodType=methodType, callbody=callBody)
-        return req
+        with self._cacheLock:
+            if not refresh and self._catalogueFresh():
+                return self._catalogue
+            Infos = requests.get(self._catalogueUrl(), headers=self._catalogueHeaders("Python-RPC-Client"), timeout=self._catalogueTimeout())
+            return self._updateCatalogue(Infos.status_code, Infos.headers.get("ETag"), None if Infos.status_code == 304 else Infos.json())
 
     def IsConnected(self) -> bool:
         """ 检测是否连接到 RPC 服务器 """
         return self.connected and self.ws.sock is not None
 
-    def _call(self, req: RpcRequest) -> RpcResponse:
-        """ 调用 RPC 服务的内部方法 """
+    def _checkHandshakeAllowed(self) -> None:
+        """ 握手 (注册/认证) 必须在第一次调用之前完成, 此后连接上的所有帧都由读取线程接管 """
+        if self._reader is not None:
+            raise RPCError("Handshake messages must be sent before any RPC call on this connection")
+
+    def _startReader(self) -> None:
+        """ 启动响应读取线程 """
+        with self._pendingLock:
+            if self._reader is None:
+                self._reader = threading.Thread(target=self._readLoop, name="PyRPC-Client-Reader", daemon=True)
+                self._reader.start()
+
+    def _readLoop(self) -> None:
+        """ 持续读取响应, 按请求ID唤醒对应的等待者 """
+        ws = self.ws
+        try:
+            while True:
+                response = ws.recv()
+                if not response: # 收到关闭帧
+                    raise RPCConnectionError("Connection closed by server")
+                rpcResponse = self.codec.decode(response, ResponseAdapter)
+                count = getattr(rpcResponse, "attachments", 0)
+                if count: # 附件帧紧随消息到达, 直接包装为 memoryview 不再复制
+                    attachAttachments(rpcResponse, [memoryview(ws.recv()) for _ in range(count)])
+                if isinstance(rpcResponse, RpcStreamCredit):
+                    self._grant(rpcResponse)
+                    continue
+                if not isinstance(rpcResponse, RpcStreamChunk):
+                    self._endUpload(rpcResponse.requestId) # 调用已经结束, 不再需要上传
+                with self._pendingLock:
+                    stream = self._streams.get(rpcResponse.requestId)
+                    future = None if stream is not None else self._pending.pop(rpcResponse.requestId, None)
+                if stream is not None:
+                    stream.put(rpcResponse)
+                elif future is not None:
+                    future.set_result(rpcResponse)
+        except Exception as e:
+            if self.ws is ws: # 重连之后旧的读取线程不再影响新连接
+                self.connected = False
+                self._failPending(RPCConnectionError(f"Connection lost: {e}"))
+
+    def _failPending(self, exc: Exception) -> None:
+        """ 连接断开时通知所有等待者 """
+        with self._pendingLock:
+            pending, self._pending = self._pending, {}
+            streams = list(self._streams.values())
+            uploads, self._uploads = list(self._uploads.values()), {}
+        for gate in uploads:
+            gate.close()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        for stream in streams:
+            stream.put(exc)
+
+    def _sendFrame(self, data: str | bytes | bytearray | memoryview) -> None:
+        """ 按编解码器的类型发送文本帧或二进制帧 """
+        if not isinstance(data, str):
+            self.ws.send(data, websocket.ABNF.OPCODE_BINARY)
+        else:
+            self.ws.send(data)
+
+    def _sendMessage(self, model) -> None:
+        """ 编码并发送消息, 大的 bytes 作为附件帧紧随其后发送 """
+        model, buffers = detachAttachments(model, self.attachmentThreshold, self.codec.nativeBytes)
+        data = self.codec.encode(model)
+        with self._sendLock:
+            self._sendFrame(data)
+            for buffer in buffers:
+                self._sendFrame(buffer)
+
+    def _send(self, req: RpcRequest, waiters: dict, waiter) -> None:
+        """ 分配请求ID, 登记等待者并发送请求 """
         if not self.IsConnected():
             raise RPCConnectionError("Not connected to the RPC server")
-        
-        requestDump = json.dumps(req.model_dump_json())
-        self.ws.send(requestDump)
-        response = self.ws.recv()
-        dictResponse = json.loads(response)
-        rpcResponse = RpcResponse(**dictResponse)
+        if self._reader is None:
+            self._startReader()
+        if req.requestId is None:
+            req.requestId = next(self._requestIds)
+        with self._pendingLock:
+            waiters[req.requestId] = waiter
+        try:
+            self._sendMessage(req)
+        except websocket.WebSocketException as e:
+            with self._pendingLock:
+                waiters.pop(req.requestId, None)
+            raise RPCConnectionError(f"Failed to send request: {e}") from e
+
+    def _submit(self, req: RpcRequest) -> Future:
+        """ 发送请求但不等待响应, 返回一个在响应到达时完成的 Future """
+        future = Future()
+        self._send(req, self._pending, future)
+        return future
+
+    def _stream(self, req: RpcRequest) -> Iterator:
+        """ 发送流式请求并接收结果 """
+        items = queue.Queue()
+        self._send(req, self._streams, items)
+        yield from self._receiveStream(req, items)
+
+    def _receiveStream(self, req: RpcRequest, items: queue.Queue) -> Iterator:
+        """ 接收流中的数据块, 每消费半个窗口就向服务器授予同样多的信用 """
+        every = max(1, req.window // 2)
+        consumed, ended = 0, False
+        try:
+            while True:
+                message = items.get()
+                if isinstance(message, RpcStreamChunk):
+                    yield message.data
+                    consumed += 1
+                    if consumed >= every:
+                        self._sendMessage(RpcStreamCredit(requestId=req.requestId, credit=consumed))
+                        consumed = 0
+                    continue
+                ended = True
+                self._checkStreamEnd(message)
+                if isinstance(message, RpcResponse): # 不是生成器函数, 只有一个结果
+                    yield message.result
+                return
+        finally:
+            with self._pendingLock:
+                self._streams.pop(req.requestId, None)
+            if not ended and self.IsConnected(): # 提前退出迭代, 通知服务器停止发送
+                try:
+                    self._sendMessage(RpcStreamCredit(requestId=req.requestId, close=True))
+                except websocket.WebSocketException:
+                    pass
+
+    def _grant(self, credit: RpcStreamCredit) -> None:
+        """ 服务器授予上传信用 """
+        with self._pendingLock:
+            gate = self._uploads.get(credit.requestId)
+        if gate is None:
+            return
+        if credit.close:
+            gate.close()
+        else:
+            gate.grant(credit.credit)
+
+    def _endUpload(self, requestId: int | None) -> None:
+        with self._pendingLock:
+            gate = self._uploads.pop(requestId, None)
+        if gate is not None:
+            gate.close()
+
+    def _openUpload(self, req: RpcRequest) -> ThreadCreditGate:
+        """ 在发送请求之前登记上传, 服务器的初始信用可能紧随请求到达 """
+        gate = ThreadCreditGate()
+        with self._pendingLock:
+            self._uploads[req.requestId] = gate
+        return gate
+
+    def _upload(self, req: RpcRequest, items: Iterable, gate: ThreadCreditGate) -> None:
+        """ 按信用逐块上传, 最后发送结束帧; 服务器提前结束调用时停止上传 """
+        count = 0
+        try:
+            for item in items:
+                if not gate.acquire():
+                    return
+                self._sendMessage(RpcStreamChunk(requestId=req.requestId, data=item))
+                count += 1
+            self._sendMessage(RpcStreamEnd(requestId=req.requestId, count=count))
+        except websocket.WebSocketException as e:
+            raise RPCConnectionError(f"Failed to upload stream: {e}") from e
+        except Exception as e:
+            # 本地产生数据时出错, 通知服务器中止这个流
+            self._sendMessage(RpcStreamEnd(requestId=req.requestId, count=count, error=f"{type(e).__name__}: {e}", IsError=True))
+            raise
+        finally:
+            self._endUpload(req.requestId)
+
+    def _call(self, req: RpcRequest | RpcBatchRequest) -> RpcResponse | RpcBatchResponse:
+        """ 调用 RPC 服务的内部方法, 服务器过载时按 retryAfter 等待后重试 """
+        attempt, deadline = 0, self._deadline(req)
+        while True:
+            wait = self._wait(req, deadline)
+            try:
+                rpcResponse = self._submit(req).result(wait)
+            except FutureTimeoutError:
+                self._abandon(req.requestId)
+                raise RPCTimeoutError(f"No response for request {req.requestId} within {req.timeout:.3f}s") from None
+            delay = self._retryDelay(rpcResponse, attempt, deadline)
+            if delay is None:
+                break
+            attempt += 1
+            time.sleep(delay)
+            req.requestId = None # 重新分配请求ID
+        if isinstance(rpcResponse, RpcBatchResponse):
+            return rpcResponse
         if rpcResponse.IsError:
             self.exceptionBack(rpcResponse.error)
         return rpcResponse
+
+    def _abandon(self, requestId: int | None) -> None:
+        """ 不再等待某个调用, 通知服务器取消它 """
+        with self._pendingLock:
+            self._pending.pop(requestId, None)
+        try:
+            self._sendMessage(RpcCancel(requestId=requestId))
+        except websocket.WebSocketException:
+            pass
+
+    def cancel(self, future: Future) -> bool:
+        """ 取消 submit 返回的调用, 服务器会停止执行; 已经完成的调用返回 False """
+        with self._pendingLock:
+            requestId = next((key for key, value in self._pending.items() if value is future), None)
+            if requestId is None: # 响应已经到达
+                return False
+            del self._pending[requestId] # 先移除等待者, 读取线程不会再设置这个 Future 的结果
+        future.cancel()
+        self._abandon(requestId)
+        return True
+
+    def submit(self, call_item: str, method_type: MethodType, call_type: CallType | None, *args, **kwargs) -> Future:
+        """ 异步提交 RPC 调用, 同一连接上可以同时存在多个在途调用 """
+        req = self._buildRequest(call_item, method_type, call_type, *args, **kwargs)
+        return self._submit(req)
     
-    def call(self, call_item: str, method_type: MethodType, call_type: CallType, *args, **kwargs) -> RpcResponse:
-        """ 调用 RPC 服务 """
+    def call(self, call_item: str, method_type: MethodType, call_type: CallType | None, *args, **kwargs) -> RpcResponse:
+        """ 调用 RPC 服务, 开启本地结果缓存时可缓存的调用直接返回缓存的结果 """
         req = self._buildRequest(call_item, method_type, call_type, *args, **kwargs)
-        return self._call(req)
+        if self._resultCacheOptions is None:
+            return self._call(req)
+        with self._cacheLock:
+            if not self._catalogueFresh():
+                self.getAllCallables()
+            cache = self._resultCacheFor(call_item)
+            key = cacheKey(req.callbody.args, req.callbody.kwargs) if cache is not None else None
+            if key is not None:
+                hit, rpcResponse = cache.get(key)
+                if hit:
+                    cache.hits += 1
+                    return rpcResponse.model_copy(deep=True) # 调用方修改结果不会影响缓存
+        rpcResponse = self._call(req)
+        if key is not None and not rpcResponse.IsError:
+            with self._cacheLock:
+                cache.misses += 1
+                cache.put(key, rpcResponse.model_copy(deep=True))
+        return rpcResponse
+
+    def batch(self, calls: list, parallel: bool = False) -> list[RpcResponse]:
+        """ 批量调用, 所有调用在一帧中发送, 结果在一帧中返回, 每个调用的错误单独返回 """
+        return self._unpackBatch(self._call(self._buildBatch(calls, parallel)))
+
+    def stream(self, call_item: str, *args, **kwargs) -> Iterator:
+        """
+        流式调用生成器函数, 服务器按客户端的消费速度逐块发送结果, 第一次迭代时才发送请求:
+
+        ```
+        for line in client.stream("tail", "app.log"):
+            print(line)
+        ```
+        """
+        return self._stream(self._buildStream(call_item, *args, **kwargs))
+
+    def clientStream(self, call_item: str, items: Iterable, *args, **kwargs) -> RpcResponse:
+        """
+        客户端流式调用, 逐块上传 items, 服务端函数的第一个参数是上传的流:
+
+        ```
+        @rpc.registerCall
+        async def ingest(rows) -> int:
+            return sum([1 async for _ in rows])
+
+        client.clientStream("ingest", (row for row in open("big.csv")))
+        ```
+        """
+        req = self._buildUpload(call_item, False, *args, **kwargs)
+        gate = self._openUpload(req)
+        future = Future()
+        deadline = self._deadline(req)
+        try:
+            self._send(req, self._pending, future)
+            self._upload(req, items, gate)
+        except Exception:
+            self._endUpload(req.requestId)
+            with self._pendingLock:
+                self._pending.pop(req.requestId, None)
+            raise
+        try:
+            rpcResponse = future.result(self._remaining(deadline))
+        except FutureTimeoutError:
+            self._abandon(req.requestId)
+            raise RPCTimeoutError(f"No response for request {req.requestId} before its deadline") from None
+        if rpcResponse.IsError:
+            self.exceptionBack(rpcResponse.error)
+        return rpcResponse
+
+    def bidiStream(self, call_item: str, items: Iterable, *args, **kwargs) -> Iterator:
+        """ 双向流式调用, 在后台线程中上传 items, 同时迭代服务端生成器返回的结果 """
+        req = self._buildUpload(call_item, True, *args, **kwargs)
+        gate = self._openUpload(req)
+        results = queue.Queue()
+        try:
+            self._send(req, self._streams, results)
+        except Exception:
+            self._endUpload(req.requestId)
+            raise
+        # 上传失败会通过结束帧通知服务器, 错误由结果流返回
+        uploader = threading.Thread(target=self._uploadQuietly, args=(req, items, gate), name="PyRPC-Client-Uploader", daemon=True)
+        uploader.start()
+        return self._receiveStream(req, results)
+
+    def _uploadQuietly(self, req: RpcRequest, items: Iterable, gate: ThreadCreditGate) -> None:
+        try:
+            self._upload(req, items, gate)
+        except Exception:
+            pass
 
     def close(self, status: int = 1000, reason: str = "") -> None:
         """ 关闭 RPC 连接 """
         if self.ws:
-            self.ws.close(status=status, reason=bytes(reason, "utf-8"))
+            if self._reader is not None and self._reader.is_alive():
+                # 读取线程占用着接收端, 只发送关闭帧, 由读取线程接收服务器的关闭回应
+                self.ws.send_close(status=status, reason=bytes(reason, "utf-8"))
+                self._reader.join(timeout=3)
+                self.ws.shutdown()
+            else:
+                self.ws.close(status=status, reason=bytes(reason, "utf-8"))
             self.connected = False
             print("Connection closed")
 
-    def exceptionBack(self, e: Exception | str) -> None:
-        """ 处理 RPC 异常 """
-        if isinstance(e, str):
-            err_info = "Call successed but got an error: \n"
-            err_info += e
-            print(err_info)
-            return
-        else:
-            err_info = ExtractException(type(e), e, e.__traceback__)
-            print(err_info)
-
     def ping(self) -> bool:
         """ 心跳检测 """
-        # Implement ping logic to test the connection
+        if not self.IsConnected():
+            return False
         try:
             self.ws.ping()
             return True
-        except websocket.WebSocketException:
+        except (websocket.WebSocketException, OSError):
             return False
 
-    def retry(self, times: int) -> None:
-        """ 重试机制 """
-        # Implement retry logic to reconnect to the server
+    def retry(self, times: int, delay: float = 0.2) -> bool:
+        """ 重试机制, 按指数退避重新连接到原来的服务器 """
         for attempt in range(times):
-            if self.connect("127.0.0.1", 8000):
+            if self.connect(self.host, self.port):
                 print(f"Reconnected on attempt {attempt + 1}")
-                break
+                return True
+            time.sleep(delay * (2 ** attempt))
+        return False
 
     def __call__(self, item: str, *args, **kwargs) -> RpcResponse:
         """ 简化调用 RPC 服务 """
-        if args:
-            return self.call(item, MethodType.CALLABLE, CallType.WITH_ARGS, *args, **kwargs)
-        elif kwargs:
-            return self.call(item, MethodType.CALLABLE, CallType.WITH_KWARGS, **kwargs)
-        elif args and kwargs:
-            return self.call(item, MethodType.CALLABLE, CallType.WITH_KEY_VALUE_PAIRS, *args, **kwargs)
-        else:
-            return self.call(item, MethodType.CALLABLE, CallType.WITH_NO_ARGS)
+        # 调用类型可以由参数推断, 不再在请求中发送
+        return self.call(item, MethodType.CALLABLE, None, *args, **kwargs)
         
     def __enter__(self) -> "RPCClient":
         return self
@@ -134,53 +438,3 @@ class RPCClient(IRPCClient):
             err_stack = ExtractException(exc_type, exc_val, exc_tb)
             self.exceptionBack(err_stack)
         self.close(1000, "RPC client wants to close the connection.")
-
-class AsyncRPCClient(RPCClient):
-    """ 异步 RPC 客户端 """
-    def __init__(self, host = "127.0.0.1", port = 8000):
-        super().__init__(host, port)
-
-    async def call(self, call_item: str, method_type: MethodType, call_type: CallType, *args, **kwargs) -> RpcResponse:
-        """ 异步调用 RPC 服务 """
-        result = await asyncio.to_thread(self._call, self._build_request(call_item, method_type, call_type, *args, **kwargs))
-        return result
-    
-    async def getAllCallables(self) -> list:
-        """ 异步获取 RPC 所有可调用服务 """
-        result = await asyncio.to_thread(
-        requests.get, 
-        "http://127.0.0.1:8000/rpc/callables/", 
-        headers={"User-Agent": "Python-Async-RPC-Client"}).json()
-        return result
-    
-    async def ping(self) -> bool:
-        """ 异步心跳检测 """
-        result = await asyncio.to_thread(self.ws.ping)
-        return result
-    
-    async def retry(self, times: int) -> None:
-        """ 异步重试机制 """
-        for attempt in range(times):
-            if await asyncio.to_thread(self.connect, "127.0.0.1", 8000):
-                print(f"Reconnected on attempt {attempt + 1}")
-                break
-
-    async def __call__(self, item: str, *args, **kwargs) -> RpcResponse:
-        """ 异步简化调用 RPC 服务 """
-        if args:
-            return await self.call(item, MethodType.CALLABLE, CallType.WITH_ARGS, *args, **kwargs)
-        elif kwargs:
-            return await self.call(item, MethodType.CALLABLE, CallType.WITH_KWARGS, **kwargs)
-        elif args and kwargs:
-            return await self.call(item, MethodType.CALLABLE, CallType.WITH_KEY_VALUE_PAIRS, *args, **kwargs)
-        else:
-            return await self.call(item, MethodType.CALLABLE, CallType.WITH_NO_ARGS)
-    
-    async def __aenter__(self) -> "AsyncRPCClient":
-        return self
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
-        if (exc_type is not None) and (exc_val is not None) and (exc_tb is not None):
-            err_stack = ExtractException(exc_type, exc_val, exc_tb)
-            self.exceptionBack(err_stack)
-        self.close(1000, "Async RPC client wants to close the connection.")
\ No newline at end of file
@@ -3,4 +3,22 @@ class RPCError(RuntimeError):
     pass
 
 class RPCConnectionError(RPCError):
-    pass
\ No newline at end of file
+    pass
+
+class RPCPoolExhaustedError(RPCError):
+    """ 连接池在超时时间内没有可用的连接 """
+    pass
+
+class RPCOverloadedError(RPCError):
+    """ 服务器过载拒绝了调用, retryAfter 是建议的重试等待时间(秒) """
+    def __init__(self, message: str, retryAfter: float | None = None) -> None:
+        super().__init__(message)
+        self.retryAfter = retryAfter
+
+class RPCTimeoutError(RPCError):
+    """ 在期限内没有收到调用的结果, 调用已经通知服务器取消 """
+    pass
+
+class RPCRateLimitedError(RPCOverloadedError):
+    """ 调用超过了服务器的限流配额 """
+    pass
@@ -0,0 +1,162 @@
+
+from ..Models import IdentityClientCard , RpcResponse
+from .example import RPCClient
+from .exceptions import RPCConnectionError , RPCPoolExhaustedError
+from contextlib import contextmanager
+from collections import deque
+from typing import Iterator , Any
+import threading
+import time
+
+class RPCClientPool:
+    """
+    线程安全的同步客户端连接池, 多个线程共享到同一服务器的连接:
+
+    ```
+    pool = RPCClientPool("127.0.0.1", 8000, size=4, maxSize=16)
+    with pool.connection() as client:
+        client("add", 1, 2)
+    pool("add", 1, 2) # 等价的简写
+    ```
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, size: int = 4, maxSize: int | None = None,
+                 codecs: list[str] | None = None, identity: IdentityClientCard | None = None,
+                 healthCheck: bool = True, retries: int = 3, timeout: float | None = 10.0,
+                 compression: str | None = None) -> None:
+        self.host = host
+        self.port = port
+        self.size = size # 预热并常驻的连接数
+        self.maxSize = max(maxSize or size, size) # 连接数上限
+        self.codecs = codecs
+        self.compression = compression
+        self.identity = identity # 如果服务器需要认证, 每个新连接都会先发送身份凭证
+        self.healthCheck = healthCheck # 取出连接时是否用 ping 检测
+        self.retries = retries # 连接断开时的重连次数
+        self.timeout = timeout # 等待空闲连接的超时时间, None 表示一直等待
+        self._idle: deque[RPCClient] = deque()
+        self._created = 0 # 已创建且未丢弃的连接数
+        self._closed = False
+        self._cond = threading.Condition()
+        for _ in range(size):
+            self._idle.append(self._newClient())
+            self._created += 1
+
+    def _newClient(self) -> RPCClient:
+        """ 创建并准备一个新连接 """
+        client = RPCClient(self.host, self.port, self.codecs, self.compression)
+        if not client.IsConnected() and not client.retry(self.retries):
+            raise RPCConnectionError(f"Cannot connect to ws://{self.host}:{self.port}")
+        self._prepare(client)
+        return client
+
+    def _prepare(self, client: RPCClient) -> None:
+        """ 新建或重连之后的握手, 重连时优先恢复会话 """
+        if self.identity is not None and client.resume().get("status") != "success":
+            client.authenticate(self.identity)
+
+    def _revive(self, client: RPCClient) -> bool:
+        """ 检查连接是否可用, 断开的连接尝试重连 """
+        if client.IsConnected() and (not self.healthCheck or client.ping()):
+            return True
+        if client.retry(self.retries):
+            self._prepare(client)
+            return True
+        return False
+
+    def checkout(self) -> RPCClient:
+        """ 取出一个连接, 连接池已满时等待其他线程归还 """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RPCConnectionError("Connection pool is closed")
+                if self._idle:
+                    client = self._idle.pop() # 后进先出, 优先使用最近用过的连接
+                    break
+                if self._created < self.maxSize:
+                    self._created += 1
+                    client = None
+                    break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise RPCPoolExhaustedError(f"No idle connection within {self.timeout}s (maxSize={self.maxSize})")
+                self._cond.wait(remaining)
+        # 建立连接和健康检查不持有锁, 避免阻塞其他线程
+        try:
+            if client is None:
+                return self._newClient()
+            if self._revive(client):
+                return client
+            raise RPCConnectionError(f"Cannot reconnect to ws://{self.host}:{self.port}")
+        except Exception:
+            self._discard(client)
+            raise
+
+    def checkin(self, client: RPCClient) -> None:
+        """ 归还连接, 已断开的连接直接丢弃 """
+        if self._closed or not client.IsConnected():
+            self._discard(client)
+            return
+        with self._cond:
+            self._idle.append(client)
+            self._cond.notify()
+
+    def _discard(self, client: RPCClient | None) -> None:
+        if client is not None:
+            try:
+                client.close(1000, "RPC client pool discards the connection.")
+            except Exception:
+                pass
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self) -> Iterator[RPCClient]:
+        """ 在上下文中使用一个连接, 退出时自动归还 """
+        client = self.checkout()
+        try:
+            yield client
+        finally:
+            self.checkin(client)
+
+    def __call__(self, item: str, *args, **kwargs) -> RpcResponse:
+        """ 简化调用 RPC 服务 """
+        with self.connection() as client:
+            return client(item, *args, **kwargs)
+
+    def batch(self, calls: list, parallel: bool = False) -> list[RpcResponse]:
+        """ 使用一个连接进行批量调用 """
+        with self.connection() as client:
+            return client.batch(calls, parallel)
+
+    def stream(self, item: str, *args, **kwargs) -> Iterator[Any]:
+        """ 流式调用, 迭代期间一直占用同一个连接 """
+        with self.connection() as client:
+            yield from client.stream(item, *args, **kwargs)
+
+    def clientStream(self, item: str, items, *args, **kwargs) -> RpcResponse:
+        """ 客户端流式调用 """
+        with self.connection() as client:
+            return client.clientStream(item, items, *args, **kwargs)
+
+    def bidiStream(self, item: str, items, *args, **kwargs) -> Iterator[Any]:
+        """ 双向流式调用, 迭代期间一直占用同一个连接 """
+        with self.connection() as client:
+            yield from client.bidiStream(item, items, *args, **kwargs)
+
+    def close(self) -> None:
+        """ 关闭连接池中所有空闲连接, 使用中的连接在归还时关闭 """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for client in idle:
+            client.close(1000, "RPC client pool closed.")
+
+    def __enter__(self) -> "RPCClientPool":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
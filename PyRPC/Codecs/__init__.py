@@ -0,0 +1,23 @@
+""" 消息编解码器模块 """
+from ._registry import CodecRegistry , SUBPROTOCOL_PREFIX
+from ._json import JsonCodec
+from ._msgpack import MsgpackCodec , msgpack
+from ._cbor import CborCodec , cbor2
+from ._pickle import PickleCodec
+from ._compression import CompressedCodec , ZlibCompressor , ZstdCompressor , zstandard , DEFAULT_COMPRESSION_THRESHOLD , DEFAULT_MAX_DECOMPRESSED_SIZE
+from ._attachments import detachAttachments , attachAttachments , ATTACHMENT_KEY , DEFAULT_ATTACHMENT_THRESHOLD
+
+codecRegistry = CodecRegistry() # 全局注册表, 客户端和服务器共用
+codecRegistry.register(JsonCodec())
+codecRegistry.register(PickleCodec())
+if msgpack is not None:
+    codecRegistry.register(MsgpackCodec())
+if cbor2 is not None:
+    codecRegistry.register(CborCodec())
+codecRegistry.registerCompressor(ZlibCompressor())
+if zstandard is not None:
+    codecRegistry.registerCompressor(ZstdCompressor())
+
+__all__ = ['CodecRegistry', 'SUBPROTOCOL_PREFIX', 'JsonCodec', 'MsgpackCodec', 'CborCodec', 'PickleCodec', 'codecRegistry',
+           'detachAttachments', 'attachAttachments', 'ATTACHMENT_KEY', 'DEFAULT_ATTACHMENT_THRESHOLD',
+           'CompressedCodec', 'ZlibCompressor', 'ZstdCompressor', 'DEFAULT_COMPRESSION_THRESHOLD', 'DEFAULT_MAX_DECOMPRESSED_SIZE']
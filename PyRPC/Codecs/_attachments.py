@@ -0,0 +1,84 @@
+
+from ..Models import RpcRequest , RpcResponse , RpcStreamChunk
+from typing import Any
+
+ATTACHMENT_KEY = "$attachment" # 占位符: {"$attachment": 序号}
+DEFAULT_ATTACHMENT_THRESHOLD = 64 * 1024 # 二进制编解码器中超过这个大小的缓冲区才作为附件发送
+_BUFFER_TYPES = (bytes, bytearray, memoryview)
+
+def _size(buffer) -> int:
+    return buffer.nbytes if isinstance(buffer, memoryview) else len(buffer)
+
+def _detachValue(value: Any, buffers: list, threshold: int) -> Any:
+    if isinstance(value, _BUFFER_TYPES) and _size(value) >= threshold:
+        buffers.append(value)
+        return {ATTACHMENT_KEY: len(buffers) - 1}
+    return value
+
+def _detach(value: Any, buffers: list, threshold: int) -> Any:
+    """ 浅层扫描: 值本身, 列表/元组的元素和字典的值, 没有附件时原样返回不做复制 """
+    if isinstance(value, _BUFFER_TYPES):
+        return _detachValue(value, buffers, threshold)
+    count = len(buffers)
+    if isinstance(value, (list, tuple)):
+        items = [_detachValue(item, buffers, threshold) for item in value]
+        if len(buffers) == count:
+            return value
+        return tuple(items) if isinstance(value, tuple) else items
+    if isinstance(value, dict):
+        items = {key: _detachValue(item, buffers, threshold) for key, item in value.items()}
+        return value if len(buffers) == count else items
+    return value
+
+def _attachValue(value: Any, buffers: list) -> Any:
+    if isinstance(value, dict) and len(value) == 1 and ATTACHMENT_KEY in value:
+        return buffers[value[ATTACHMENT_KEY]]
+    return value
+
+def _attach(value: Any, buffers: list) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and ATTACHMENT_KEY in value:
+            return buffers[value[ATTACHMENT_KEY]]
+        return {key: _attachValue(item, buffers) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_attachValue(item, buffers) for item in value]
+        return tuple(items) if isinstance(value, tuple) else items
+    return value
+
+def detachAttachments(message: Any, threshold: int, nativeBytes: bool = True) -> tuple[Any, list]:
+    """
+    把消息中的大缓冲区替换为占位符, 返回 (要编码的消息, 需要在消息之后作为二进制帧发送的缓冲区)。
+    不修改传入的消息: 有附件时返回浅拷贝, 同一条消息可以重复发送 (例如过载后重试)。
+    文本编解码器 (JSON) 不能表示 bytes, 所有缓冲区都作为附件发送。
+    """
+    if not nativeBytes:
+        threshold = 0
+    buffers = []
+    if isinstance(message, RpcRequest):
+        body = message.callbody
+        args = _detach(body.args, buffers, threshold)
+        kwargs = _detach(body.kwargs, buffers, threshold)
+        if buffers:
+            body = body.model_copy(update={"args": args, "kwargs": kwargs})
+            return message.model_copy(update={"callbody": body, "attachments": len(buffers)}), buffers
+    elif isinstance(message, RpcResponse):
+        result = _detach(message.result, buffers, threshold)
+        if buffers:
+            return message.model_copy(update={"result": result, "attachments": len(buffers)}), buffers
+    elif isinstance(message, RpcStreamChunk):
+        data = _detach(message.data, buffers, threshold)
+        if buffers:
+            return message.model_copy(update={"data": data, "attachments": len(buffers)}), buffers
+    return message, buffers
+
+def attachAttachments(message: Any, buffers: list) -> Any:
+    """ 用接收到的附件 (memoryview) 替换消息中的占位符 """
+    if isinstance(message, RpcRequest):
+        body = message.callbody
+        body.args = _attach(body.args, buffers)
+        body.kwargs = _attach(body.kwargs, buffers)
+    elif isinstance(message, RpcResponse):
+        message.result = _attach(message.result, buffers)
+    elif isinstance(message, RpcStreamChunk):
+        message.data = _attach(message.data, buffers)
+    return message
@@ -0,0 +1,44 @@
+
+from ..Interfaces import IRPCCodec
+from datetime import timezone
+from typing import Any
+
+try:
+    import cbor2
+except ImportError: # 可选依赖
+    cbor2 = None
+
+TAG_NDARRAY = 40000 # numpy 数组: [dtype, shape, 原始字节]
+
+class CborCodec(IRPCCodec):
+    """ CBOR 编解码器, 使用二进制帧, 原生支持 bytes/大整数/datetime """
+    name = "cbor"
+    binary = True
+
+    def __init__(self) -> None:
+        if cbor2 is None:
+            raise RuntimeError("cbor2 is not installed, run `pip install cbor2` to use the cbor codec")
+
+    def dumps(self, obj: Any) -> bytes:
+        return cbor2.dumps(obj, timezone=timezone.utc, default=self._default)
+
+    def loads(self, data: str | bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return cbor2.loads(data, tag_hook=self._tagHook)
+
+    @staticmethod
+    def _default(encoder, obj: Any) -> None:
+        """ 处理 CBOR 原生不支持的类型 """
+        if hasattr(obj, "__array_interface__") and hasattr(obj, "tobytes"):
+            encoder.encode(cbor2.CBORTag(TAG_NDARRAY, [str(obj.dtype), list(obj.shape), obj.tobytes()]))
+            return
+        raise TypeError(f"Object of type {type(obj).__name__} is not cbor serializable")
+
+    @staticmethod
+    def _tagHook(decoder, tag) -> Any:
+        if tag.tag == TAG_NDARRAY:
+            import numpy
+            dtype, shape, raw = tag.value
+            return numpy.frombuffer(raw, dtype=dtype).reshape(shape)
+        return tag
@@ -0,0 +1,103 @@
+
+from ..Interfaces import IRPCCodec
+from pydantic import BaseModel , TypeAdapter
+from typing import Any
+import zlib
+
+try:
+    import zstandard
+except ImportError: # 可选依赖
+    zstandard = None
+
+DEFAULT_COMPRESSION_THRESHOLD = 1024 # 超过这个大小 (字节) 的帧才压缩, 小帧压缩只会更慢
+FLAG_RAW = b"\x00" # 帧的第一个字节: 未压缩
+FLAG_COMPRESSED = b"\x01" # 帧的第一个字节: 已压缩
+DEFAULT_MAX_DECOMPRESSED_SIZE = 64 * 1024 * 1024 # 解压后帧的最大大小 (字节), 防止很小的帧解压出巨大的数据
+
+class ZlibCompressor:
+    """ zlib 压缩, 标准库自带 """
+    name = "zlib"
+
+    def __init__(self, level: int = 6, maxSize: int = DEFAULT_MAX_DECOMPRESSED_SIZE) -> None:
+        self.level = level
+        self.maxSize = maxSize # 解压后的最大大小, 超过时拒绝这一帧
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes | memoryview) -> bytes:
+        decompressor = zlib.decompressobj()
+        result = decompressor.decompress(data, self.maxSize)
+        if decompressor.unconsumed_tail: # 输出达到上限时还有没有解压的输入
+            raise ValueError(f"Decompressed frame exceeds {self.maxSize} bytes")
+        if not decompressor.eof: # zlib.decompress 对截断的数据会报错, 这里保持一致
+            raise ValueError("Truncated zlib frame")
+        return result
+
+class ZstdCompressor:
+    """ zstd 压缩, 比 zlib 更快, 需要 `pip install zstandard` """
+    name = "zstd"
+
+    def __init__(self, level: int = 3, maxSize: int = DEFAULT_MAX_DECOMPRESSED_SIZE) -> None:
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed, run `pip install zstandard` to use zstd compression")
+        self.level = level
+        self.maxSize = maxSize # 解压后的最大大小, 超过时拒绝这一帧
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def decompress(self, data: bytes | memoryview) -> bytes:
+        # 帧头中声明了大小时按声明的大小分配内存, 所以要先检查声明的大小
+        if zstandard.frame_content_size(data) > self.maxSize:
+            raise ValueError(f"Decompressed frame exceeds {self.maxSize} bytes")
+        try:
+            return self._decompressor.decompress(data, max_output_size=self.maxSize)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Invalid zstd frame or decompressed frame exceeds {self.maxSize} bytes: {e}") from None
+
+class CompressedCodec(IRPCCodec):
+    """
+    在编解码器外层按大小阈值压缩, 子协议为 "pyrpc.<codec>.<compression>"。
+    每一帧的第一个字节标记是否压缩, 所以两端可以使用不同的阈值。
+    """
+    binary = True
+
+    def __init__(self, codec: IRPCCodec, compressor, threshold: int = DEFAULT_COMPRESSION_THRESHOLD) -> None:
+        self.codec = codec
+        self.compressor = compressor
+        self.threshold = threshold
+        self.name = f"{codec.name}.{compressor.name}"
+        self.trusted = codec.trusted
+
+    @property
+    def nativeBytes(self) -> bool:
+        return self.codec.nativeBytes
+
+    def _pack(self, data: str | bytes) -> bytes:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if len(data) >= self.threshold:
+            return FLAG_COMPRESSED + self.compressor.compress(data)
+        return FLAG_RAW + data
+
+    def _unpack(self, data: str | bytes) -> str | bytes:
+        if isinstance(data, str): # 文本帧没有压缩标记
+            return data
+        if data[:1] == FLAG_COMPRESSED:
+            return self.compressor.decompress(memoryview(data)[1:])
+        return data[1:]
+
+    def dumps(self, obj: Any) -> bytes:
+        return self._pack(self.codec.dumps(obj))
+
+    def loads(self, data: str | bytes) -> Any:
+        return self.codec.loads(self._unpack(data))
+
+    def encode(self, model: BaseModel) -> bytes:
+        return self._pack(self.codec.encode(model))
+
+    def decode(self, data: str | bytes, modelType: type[BaseModel] | TypeAdapter) -> BaseModel:
+        return self.codec.decode(self._unpack(data), modelType)
@@ -0,0 +1,29 @@
+
+from ..Interfaces import IRPCCodec
+from ..Models import RpcProtocol
+from pydantic import BaseModel , TypeAdapter
+from typing import Any
+import json
+
+class JsonCodec(IRPCCodec):
+    """ JSON 编解码器, 使用文本帧, 浏览器和未协商的客户端默认使用 """
+    name = "json"
+    binary = False
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+    def loads(self, data: str | bytes) -> Any:
+        if isinstance(data, str):
+            data = RpcProtocol.unwrapFrame(data)
+        return json.loads(data)
+
+    def encode(self, model: BaseModel) -> str:
+        return model.model_dump_json()
+
+    def decode(self, data: str | bytes, modelType: type[BaseModel] | TypeAdapter) -> BaseModel:
+        if isinstance(data, str):
+            data = RpcProtocol.unwrapFrame(data)
+        if isinstance(modelType, TypeAdapter):
+            return modelType.validate_json(data)
+        return modelType.model_validate_json(data)
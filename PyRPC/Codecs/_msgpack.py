@@ -0,0 +1,58 @@
+
+from ..Interfaces import IRPCCodec
+from datetime import datetime
+from typing import Any
+
+try:
+    import msgpack
+except ImportError: # 可选依赖
+    msgpack = None
+
+EXT_BIGINT = 1 # 超过64位的整数
+EXT_NDARRAY = 2 # numpy 数组: (dtype, shape, 原始字节)
+EXT_NAIVE_DATETIME = 3 # 不带时区的 datetime
+
+class MsgpackCodec(IRPCCodec):
+    """ msgpack 编解码器, 使用二进制帧, bytes 原样传输 """
+    name = "msgpack"
+    binary = True
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise RuntimeError("msgpack is not installed, run `pip install msgpack` to use the msgpack codec")
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(obj, use_bin_type=True, default=self._default)
+
+    def loads(self, data: str | bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return msgpack.unpackb(data, raw=False, timestamp=3, strict_map_key=False, ext_hook=self._extHook)
+
+    @staticmethod
+    def _default(obj: Any) -> Any:
+        """ 处理 msgpack 原生不支持的类型 """
+        if isinstance(obj, int):
+            return msgpack.ExtType(EXT_BIGINT, str(obj).encode("ascii"))
+        if isinstance(obj, datetime):
+            if obj.tzinfo is not None:
+                return msgpack.Timestamp.from_datetime(obj)
+            return msgpack.ExtType(EXT_NAIVE_DATETIME, obj.isoformat().encode("ascii"))
+        if hasattr(obj, "__array_interface__") and hasattr(obj, "tobytes"):
+            payload = msgpack.packb((str(obj.dtype), list(obj.shape), obj.tobytes()), use_bin_type=True)
+            return msgpack.ExtType(EXT_NDARRAY, payload)
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+    @staticmethod
+    def _extHook(code: int, data: bytes) -> Any:
+        if code == EXT_BIGINT:
+            return int(data.decode("ascii"))
+        if code == EXT_NAIVE_DATETIME:
+            return datetime.fromisoformat(data.decode("ascii"))
+        if code == EXT_NDARRAY:
+            import numpy
+            dtype, shape, raw = msgpack.unpackb(data, raw=False)
+            return numpy.frombuffer(raw, dtype=dtype).reshape(shape)
+        return msgpack.ExtType(code, data)
@@ -0,0 +1,21 @@
+
+from ..Interfaces import IRPCCodec
+from typing import Any
+import pickle
+
+class PickleCodec(IRPCCodec):
+    """
+    pickle 编解码器, 可以传输任意 python 对象。
+    反序列化 pickle 数据可以执行任意代码, 只能在双方互相信任的环境中显式开启。
+    """
+    name = "pickle"
+    binary = True
+    trusted = True
+
+    def dumps(self, obj: Any) -> bytes:
+        return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data: str | bytes) -> Any:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return pickle.loads(data)
@@ -0,0 +1,87 @@
+
+from ..Interfaces import IRPCCodec
+from ..Utils.logger import getLogger
+from ._compression import CompressedCodec , DEFAULT_COMPRESSION_THRESHOLD
+from typing import Iterable
+
+SUBPROTOCOL_PREFIX = "pyrpc." # 子协议格式: pyrpc.<codec> 或 pyrpc.<codec>.<compression>
+
+class CodecRegistry:
+    """ 编解码器注册表, 负责根据客户端提供的子协议选择编解码器 """
+    def __init__(self) -> None:
+        self.codecs: dict[str, IRPCCodec] = {}
+        self.compressors: dict[str, object] = {} # 应用层压缩算法
+        self.default = "json" # 客户端没有提供子协议时使用 (例如浏览器)
+        self.logger = getLogger(self.__class__.__name__)
+
+    def register(self, codec: IRPCCodec) -> None:
+        """ 注册编解码器 """
+        if codec.name in self.codecs:
+            self.logger.warning(f"Codec {codec.name} already registered, overwriting")
+        self.codecs[codec.name] = codec
+
+    def registerCompressor(self, compressor) -> None:
+        """ 注册压缩算法 """
+        self.compressors[compressor.name] = compressor
+
+    def availableCompressions(self) -> list[str]:
+        return list(self.compressors)
+
+    def get(self, name: str) -> IRPCCodec:
+        """ 按名称获取编解码器 """
+        if name not in self.codecs:
+            raise KeyError(f"Codec {name} is not registered, available codecs: {list(self.codecs)}")
+        return self.codecs[name]
+
+    def available(self, includeTrusted: bool = False) -> list[str]:
+        """ 可用的编解码器名称, 默认不包含只能在可信环境中使用的编解码器 """
+        return [name for name, codec in self.codecs.items() if includeTrusted or not codec.trusted]
+
+    @staticmethod
+    def subprotocol(name: str) -> str:
+        return f"{SUBPROTOCOL_PREFIX}{name}"
+
+    def subprotocols(self, names: Iterable[str], compression: str | None = None) -> list[str]:
+        """ 客户端握手时提供的子协议列表, 顺序即优先级; 指定压缩时每个编解码器先提供压缩版本 """
+        result = []
+        for name in names:
+            name = self.get(name).name
+            if compression is not None:
+                if compression not in self.compressors:
+                    raise KeyError(f"Compression {compression} is not registered, available: {list(self.compressors)}")
+                result.append(self.subprotocol(f"{name}.{compression}"))
+            result.append(self.subprotocol(name))
+        return result
+
+    @staticmethod
+    def _parse(subprotocol: str) -> tuple[str, str | None]:
+        """ 解析子协议, 返回编解码器名称和压缩算法 """
+        name, _, compression = subprotocol[len(SUBPROTOCOL_PREFIX):].partition(".")
+        return name, compression or None
+
+    def _build(self, name: str, compression: str | None, threshold: int) -> IRPCCodec:
+        codec = self.get(name)
+        if compression is None:
+            return codec
+        return CompressedCodec(codec, self.compressors[compression], threshold)
+
+    def negotiate(self, offered: Iterable[str], allowed: Iterable[str], compressions: Iterable[str] = (),
+                  threshold: int = DEFAULT_COMPRESSION_THRESHOLD) -> tuple[IRPCCodec, str | None]:
+        """ 按客户端的优先级选择第一个服务器允许的编解码器 (和压缩算法), 返回编解码器和需要回应的子协议 """
+        allowed, compressions = set(allowed), set(compressions)
+        for subprotocol in offered:
+            if not subprotocol.startswith(SUBPROTOCOL_PREFIX):
+                continue
+            name, compression = self._parse(subprotocol)
+            if name not in allowed or name not in self.codecs:
+                continue
+            if compression is not None and (compression not in compressions or compression not in self.compressors):
+                continue
+            return self._build(name, compression, threshold), subprotocol
+        return self.codecs[self.default], None
+
+    def fromSubprotocol(self, subprotocol: str | None, threshold: int = DEFAULT_COMPRESSION_THRESHOLD) -> IRPCCodec:
+        """ 根据服务器回应的子协议取得编解码器 """
+        if subprotocol and subprotocol.startswith(SUBPROTOCOL_PREFIX):
+            return self._build(*self._parse(subprotocol), threshold)
+        return self.codecs[self.default]
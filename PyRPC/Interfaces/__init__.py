@@ -3,5 +3,7 @@ from .rpcclient import IRPCClient
 from .rpchandler import IRPCHandler
 from .rpcserver import IRPCServer
 from .rpcmiddle import IRPCMiddleWare
+from .rpccodec import IRPCCodec
+from .rpcinstrument import IRPCInstrument
 
-__all__ = ['IRemoteCallable', 'IRPCClient', 'IRPCHandler', 'IRPCServer', 'IRPCMiddleWare']
\ No newline at end of file
+__all__ = ['IRemoteCallable', 'IRPCClient', 'IRPCHandler', 'IRPCServer', 'IRPCMiddleWare', 'IRPCCodec', 'IRPCInstrument']
\ No newline at end of file
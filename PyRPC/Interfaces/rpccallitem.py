@@ -2,6 +2,7 @@
 
 from abc import ABC, abstractmethod
 from typing import Callable
+from ..Models import CallOptions
 
 class IRemoteCallable(ABC):
 
@@ -10,6 +11,7 @@ class IRemoteCallable(ABC):
         """ 初始化远程调用函数 """
         self.name = name
         self.callitems: dict[str, Callable] = {}
+        self.calloptions: dict[str, CallOptions] = {}
 
     @abstractmethod
     def call(self, *args, **kwargs) -> object:
@@ -5,8 +5,8 @@ from typing import Any
 
 class IRPCClient(ABC):
     @abstractmethod
-    def connect(self, host: str, port: int) -> None:
-        """ 连接到远程RPC服务器 """
+    def connect(self, host: str, port: int) -> bool:
+        """ 连接到远程RPC服务器, 返回是否连接成功 """
 
     @abstractmethod
     def IsConnected(self) -> bool:
@@ -38,6 +38,6 @@ class IRPCClient(ABC):
         pass
 
     @abstractmethod
-    def retry(self, times: int) -> None:
-        """ 如果连接失败,重试次数 """
+    def retry(self, times: int) -> bool:
+        """ 如果连接失败,重试次数, 返回是否重连成功 """
         pass
\ No newline at end of file
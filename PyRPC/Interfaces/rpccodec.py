@@ -0,0 +1,35 @@
+
+from abc import ABC, abstractmethod
+from pydantic import BaseModel , TypeAdapter
+from typing import Any
+
+class IRPCCodec(ABC):
+    """ 消息编解码器接口, 在连接握手时通过 WebSocket 子协议协商 """
+    name: str = "" # 编解码器名称, 子协议为 "pyrpc.<name>"
+    binary: bool = False # 是否使用二进制帧发送
+    trusted: bool = False # 是否只能在可信环境中使用 (例如 pickle), 需要服务器显式开启
+
+    @property
+    def nativeBytes(self) -> bool:
+        """ 编码格式能否直接表示 bytes, 不能表示时所有 bytes 都作为附件发送 """
+        return self.binary
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> str | bytes:
+        """ 把 python 对象编码为一帧数据 """
+        pass
+
+    @abstractmethod
+    def loads(self, data: str | bytes) -> Any:
+        """ 把一帧数据解码为 python 对象 """
+        pass
+
+    def encode(self, model: BaseModel) -> str | bytes:
+        """ 编码消息模型 """
+        return self.dumps(model.model_dump(mode="python"))
+
+    def decode(self, data: str | bytes, modelType: type[BaseModel] | TypeAdapter) -> BaseModel:
+        """ 解码消息模型, modelType 也可以是多种消息组成的 TypeAdapter """
+        if isinstance(modelType, TypeAdapter):
+            return modelType.validate_python(self.loads(data))
+        return modelType.model_validate(self.loads(data))
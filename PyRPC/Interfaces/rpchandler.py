@@ -1,7 +1,9 @@
 
 from abc import ABC, abstractmethod
-from ..Models.datamodels import RpcRequest , RpcResponse
+from ..Models.datamodels import RpcRequest , RpcResponse , RpcBatchRequest , RpcBatchResponse , BatchResult
+from ..Models import MethodType
 from typing import Any , Callable
+import asyncio
 
 class IRPCHandler(ABC):
 
@@ -10,18 +12,36 @@ class IRPCHandler(ABC):
         pass
 
     @abstractmethod
-    def handleRequest(self, request: RpcRequest) -> RpcResponse:
-        """ 处理RPC请求 """
+    async def handleRequest(self, request: RpcRequest) -> RpcResponse:
+        """ 处理RPC请求, 由服务器在事件循环中等待 """
         pass
 
+    async def handleBatch(self, request: RpcBatchRequest) -> RpcBatchResponse:
+        """ 处理批量请求, 每个调用都交给 handleRequest, 结果顺序与调用顺序一致 """
+        requests = [RpcRequest.model_construct(protocol=request.protocol, requestId=None, callType=None, callbody=body, methodType=MethodType.CALLABLE)
+                    for body in request.calls]
+        if request.parallel:
+            responses = await asyncio.gather(*(self._handleSafe(req) for req in requests))
+        else:
+            responses = [await self._handleSafe(req) for req in requests]
+        results = [BatchResult.model_construct(result=r.result, error=r.error, IsError=r.IsError, code=r.code) for r in responses]
+        return RpcBatchResponse.model_construct(kind="batch", protocol=request.protocol, requestId=request.requestId, results=results)
+
+    async def _handleSafe(self, request: RpcRequest) -> RpcResponse:
+        """ 批量调用中单个调用出错不影响其他调用 """
+        try:
+            return await self.handleRequest(request)
+        except Exception as e:
+            return self.exceptionReturn(e)
+
     @abstractmethod
-    def _handle(self, request: RpcRequest) -> RpcResponse:
+    async def _handle(self, request: RpcRequest) -> RpcResponse:
         """ 处理RPC请求 """
         pass
 
     @abstractmethod
-    def callCanCallable(self, func: Callable, *args, **kwargs) -> Any:
-        """ 处理函数调用 """
+    async def callCanCallable(self, func: Callable, *args, **kwargs) -> Any:
+        """ 处理函数调用, 协程函数应当被直接等待 """
         pass
 
     @abstractmethod
@@ -0,0 +1,27 @@
+from abc import ABC
+from ..Models import RpcRequest , PipelineStage
+
+class IRPCInstrument(ABC):
+    """
+    插桩接口, 调用每经过服务端流水线的一个阶段, 插桩都会收到这个阶段的耗时:
+
+    ```
+    class StageTimer(IRPCInstrument):
+        def onStage(self, stage, request, elapsed):
+            histograms[stage].observe(elapsed)
+
+    server.addInstrument(StageTimer())
+    ```
+
+    钩子在事件循环线程中同步调用, 必须很快并且不能阻塞。没有注册插桩时服务器不做这些计时。
+    批量调用中的单个调用只经过 dispatch 和 execute 阶段, 也不会收到 onCallEnd; 流式调用的数据块不单独计时。
+    在开始执行之前就被取消的调用 (例如客户端断开) 也不会收到 onCallEnd。
+    """
+
+    def onStage(self, stage: PipelineStage, request: RpcRequest, elapsed: float) -> None:
+        """ 某个阶段结束, elapsed 是这个阶段的耗时(秒) """
+        pass
+
+    def onCallEnd(self, request: RpcRequest, stages: dict[PipelineStage, float]) -> None:
+        """ 调用结束 (响应已经发送, 或者调用被拒绝、取消), stages 是这次调用各阶段的累计耗时(秒) """
+        pass
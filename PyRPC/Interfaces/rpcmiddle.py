@@ -1,25 +1,43 @@
 
-from abc import ABC, abstractmethod
+from abc import ABC
 from fastapi import WebSocket , FastAPI
 from ..Models import MiddleWareStatus
-from typing import Optional , Any
+from typing import Optional , Any , Awaitable , Callable , TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..Server.pipeline import CallContext
 
 class IRPCMiddleWare(ABC):
-    """ 自定义RPC中间件接口 """
+    """
+    自定义RPC中间件接口。
+    before/after 在每个连接开始和结束时各调用一次, around 包裹连接上的每一次调用:
+
+    ```
+    class Timing(IRPCMiddleWare):
+        async def around(self, call, next):
+            response = await next(call)
+            print(call.callitem, time.perf_counter() - call.start)
+            return response
+    ```
+
+    只实现需要的钩子即可, 没有实现的钩子不会进入调用链。
+    """
 
     def __init__(self, sequence: int = 0) -> None:
         self.sequence = sequence
 
-    @abstractmethod
     async def before(self,app: FastAPI, ws: Optional[WebSocket] = None, *args, **kwargs) -> tuple[str, MiddleWareStatus]:
         """ 再处理RPC请求之前的操作 """
-        pass
+        return self.__class__.__name__, MiddleWareStatus.CONTINUE
 
-    @abstractmethod
     async def after(self,app: FastAPI, ws: Optional[WebSocket] = None, *args, **kwargs) -> None:
         """ 再处理RPC请求之后的操作 """
         pass
 
+    async def around(self, call: "CallContext", next: Callable[["CallContext"], Awaitable[Any]]) -> Any:
+        """ 包裹每一次调用, 可以直接返回 call.reject(...) 拒绝调用, 或者 await next(call) 继续 """
+        return await next(call)
+
     async def __call__(self, app: FastAPI, ws: Optional[WebSocket] = None, *args, **kwargs) -> Any:
         """ 允许更直观的调用中间件 """
-        pass
\ No newline at end of file
+        pass
@@ -1,8 +1,14 @@
 
-from .datamodels import RpcRequest , RpcResponse , CallBody , CallableCheckResponse
-from .datamodels import AuthRegisterPayload ,  IdentityClientCard
-from ._enums import CallType , MethodType , MiddleWareStatus
+from .datamodels import RpcRequest , RpcResponse , CallBody , CallableCheckResponse , RpcProtocol
+from .datamodels import PROTOCOL_VERSION , LEGACY_PROTOCOL_VERSIONS
+from .datamodels import RpcBatchRequest , RpcBatchResponse , BatchResult , RequestAdapter , ResponseAdapter
+from .datamodels import RpcStreamChunk , RpcStreamEnd , RpcStreamCredit , RpcCancel
+from .datamodels import AuthRegisterPayload ,  IdentityClientCard , CallOptions , CachePolicy , RateLimit , SlowCall
+from ._enums import CallType , MethodType , MiddleWareStatus , ExecutionPolicy , ErrorCode , PipelineStage
 
 __all__ = ["RpcRequest", "CallType", "MethodType", "RpcResponse", "CallBody", "CallableCheckResponse", 
-"AuthRegisterPayload", "IdentityClientCard" , "MiddleWareStatus"
+"AuthRegisterPayload", "IdentityClientCard" , "MiddleWareStatus" , "CallOptions" , "CachePolicy" , "RateLimit" , "ExecutionPolicy" , "ErrorCode" , "PipelineStage" , "SlowCall" ,
+"RpcProtocol" , "PROTOCOL_VERSION" , "LEGACY_PROTOCOL_VERSIONS" ,
+"RpcBatchRequest" , "RpcBatchResponse" , "BatchResult" , "RequestAdapter" , "ResponseAdapter" ,
+"RpcStreamChunk" , "RpcStreamEnd" , "RpcStreamCredit" , "RpcCancel"
 ]
\ No newline at end of file
@@ -17,10 +17,38 @@ class MethodType(StrEnum):
     """
     CALLABLE: str = "callable"
 
+class ExecutionPolicy(StrEnum):
+    """
+    可调用对象在服务端的执行方式
+    """
+    INLINE = "inline" # 直接在事件循环中执行, 适合非常快的函数
+    THREAD = "thread" # 在有界线程池中执行, 适合阻塞 I/O
+    PROCESS = "process" # 在进程池中执行, 适合 CPU 密集型计算
+
 class MiddleWareStatus(StrEnum):
     """
     中间件的状态
     """
     NORMAL = "normal"
     CONTINUE = "continue"
-    WANT_TO_CLOSE = "want to close the connection"
\ No newline at end of file
+    WANT_TO_CLOSE = "want to close the connection"
+
+class ErrorCode(StrEnum):
+    """
+    错误响应的分类, 客户端据此决定是否重试
+    """
+    OVERLOADED = "overloaded" # 服务器过载, 按 retryAfter 等待后重试
+    DEADLINE_EXCEEDED = "deadline exceeded" # 调用超过了请求携带的期限, 服务器已停止执行
+    RATE_LIMITED = "rate limited" # 超过了限流配额, 按 retryAfter 等待后重试
+
+class PipelineStage(StrEnum):
+    """
+    一次调用在服务端经过的阶段, 插桩在每个阶段结束时收到耗时
+    """
+    RECEIVE = "receive" # 读取消息之后的附件帧
+    VALIDATE = "validate" # 解码并校验消息
+    QUEUE = "queue" # 等待准入控制
+    DISPATCH = "dispatch" # 查找调用器
+    EXECUTE = "execute" # 执行函数 (流式调用覆盖整个流)
+    SERIALIZE = "serialize" # 编码响应
+    SEND = "send" # 写出响应, 包括等待发送锁
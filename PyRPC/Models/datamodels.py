@@ -1,8 +1,25 @@
-from pydantic import BaseModel
-from ._enums import CallType, MethodType
+from pydantic import BaseModel , TypeAdapter , Tag , Discriminator , Field , PrivateAttr
+from ._enums import CallType, MethodType, ExecutionPolicy, ErrorCode
+from typing import Annotated , Literal , Union
+import json
+
+PROTOCOL_VERSION = '1.1'  # 1.1: 请求帧只进行一次 JSON 编码
+LEGACY_PROTOCOL_VERSIONS = ('1.0',)  # 仍然兼容的旧版本
 
 class RpcProtocol(BaseModel):
-    version: str = '1.0'  # 协议版本
+    version: str = PROTOCOL_VERSION  # 协议版本
+
+    @property
+    def IsLegacy(self) -> bool:
+        """ 是否为旧版本协议 """
+        return self.version in LEGACY_PROTOCOL_VERSIONS
+
+    @staticmethod
+    def unwrapFrame(data: str) -> str:
+        """ 1.0 版本的客户端把 JSON 再编码成 JSON 字符串发送, 这里去掉外层编码 """
+        if data[:1] == '"':
+            return json.loads(data)
+        return data
 
 class CallBody(BaseModel):
     callitem: str # 调用的函数名或方法名
@@ -10,23 +27,115 @@ class CallBody(BaseModel):
     kwargs: dict = {}  # 请求的关键字参数
 
 class RpcRequest(BaseModel):
-    protocol: RpcProtocol = RpcProtocol(version='1.0')  # 请求协议版本
-    callType: CallType  # 请求类型
+    protocol: RpcProtocol = RpcProtocol()  # 请求协议版本
+    requestId: int | None = None  # 请求ID, 用于在同一连接上匹配响应
+    callType: CallType | None = None  # 请求类型, 可选, 服务端直接按参数调用
     callbody: CallBody  # 调用请求体
     methodType: MethodType  # 请求的方法类型
+    stream: bool = False  # 客户端是否按流接收生成器的结果, 否则生成器的结果会被收集为列表
+    window: int | None = None  # 流式响应的信用窗口, 最多允许多少个未确认的数据块
+    upload: bool = False  # 客户端是否在请求之后上传数据块, 上传的流作为第一个参数传给函数
+    attachments: int = 0  # 紧随其后的二进制附件帧数量
+    timeout: float | None = None  # 调用的期限(秒), 从服务器收到请求开始计算, 超过后服务器停止执行
+    _stages: dict | None = PrivateAttr(default=None)  # 服务端累计的各阶段耗时, 只在注册了插桩时存在, 不参与序列化
     
     
 class RpcResponse(BaseModel):
-    protocol: RpcProtocol = RpcProtocol(version='1.0')  # 响应协议版本
+    protocol: RpcProtocol = RpcProtocol()  # 响应协议版本
+    requestId: int | None = None  # 对应的请求ID
     result: object  # 响应结果
     error: str | None = ''  # 错误信息
     IsError: bool = False  # 是否有错误
+    attachments: int = 0  # 紧随其后的二进制附件帧数量
+    code: ErrorCode | None = None  # 错误分类, 普通的调用异常为 None
+    retryAfter: float | None = None  # 建议客户端等待多久再重试(秒)
+
+class RpcBatchRequest(BaseModel):
+    """ 批量调用, 一帧中携带多个调用 """
+    kind: Literal['batch'] = 'batch'  # 消息类型
+    protocol: RpcProtocol = RpcProtocol()  # 请求协议版本
+    requestId: int | None = None  # 请求ID
+    calls: list[CallBody]  # 调用列表
+    parallel: bool = False  # 是否并发执行, 否则按顺序执行
+
+class BatchResult(BaseModel):
+    """ 批量调用中单个调用的结果 """
+    result: object = None  # 响应结果
+    error: str | None = None  # 错误信息
+    IsError: bool = False  # 是否有错误
+    code: ErrorCode | None = None  # 错误分类
+    retryAfter: float | None = None  # 建议客户端等待多久再重试(秒)
+
+class RpcBatchResponse(BaseModel):
+    """ 批量调用的响应, 结果顺序与调用顺序一致 """
+    kind: Literal['batch'] = 'batch'  # 消息类型
+    protocol: RpcProtocol = RpcProtocol()  # 响应协议版本
+    requestId: int | None = None  # 对应的请求ID
+    results: list[BatchResult]  # 每个调用的结果
+
+class RpcStreamChunk(BaseModel):
+    """ 流中的一个数据块 """
+    kind: Literal['chunk'] = 'chunk'  # 消息类型
+    requestId: int | None = None  # 所属的请求ID
+    data: object = None  # 数据
+    attachments: int = 0  # 紧随其后的二进制附件帧数量
+
+class RpcStreamEnd(BaseModel):
+    """ 流的结束帧, 出错时携带错误信息 """
+    kind: Literal['end'] = 'end'  # 消息类型
+    requestId: int | None = None  # 所属的请求ID
+    count: int = 0  # 发送的数据块数量
+    error: str | None = None  # 错误信息
+    IsError: bool = False  # 是否有错误
+    code: ErrorCode | None = None  # 错误分类
+
+class RpcStreamCredit(BaseModel):
+    """ 接收方授予发送方的信用, 每个信用允许发送一个数据块 """
+    kind: Literal['credit'] = 'credit'  # 消息类型
+    requestId: int | None = None  # 所属的请求ID
+    credit: int = 0  # 新增的信用
+    close: bool = False  # 接收方不再需要更多数据, 发送方应当结束这个流
+
+class RpcCancel(BaseModel):
+    """ 客户端放弃了某个调用, 服务器取消对应的任务 """
+    kind: Literal['cancel'] = 'cancel'  # 消息类型
+    requestId: int | None = None  # 要取消的请求ID
+
+class CachePolicy(BaseModel):
+    """ 服务端结果缓存策略, 只应该用于纯函数或变化很慢的函数 """
+    ttl: float | None = None  # 过期时间(秒), None 表示不过期
+    maxEntries: int = 10000  # 最多缓存的条目数
+    maxBytes: int | None = None  # 最多占用的字节数 (估算), None 表示不限制
+
+class RateLimit(BaseModel):
+    """ 令牌桶限流的参数 """
+    rate: float = Field(gt=0)  # 每秒补充的令牌数
+    burst: float = Field(gt=0)  # 最多积累的令牌数, 即允许的突发调用数
+
+class CallOptions(BaseModel):
+    """ 注册可调用对象时指定的选项 """
+    policy: ExecutionPolicy = ExecutionPolicy.INLINE  # 执行策略
+    cache: CachePolicy | None = None  # 结果缓存策略, None 表示不缓存
+    idempotent: bool = False  # 相同参数的调用结果相同且没有副作用, 客户端可以缓存结果
+    concurrency: int | None = None  # 同时执行的调用上限, None 表示不限制
+    queue: int = 0  # 达到上限后排队等待的调用上限, 超出时按过载拒绝
 
 class CallableCheckResponse(BaseModel):
     requireArgs: tuple  # 要求的参数
     requireKwargs: dict  # 要求的关键字参数
     callName: str  # 调用的函数名或方法名
     returnType: str  # 返回值类型
+    cacheable: bool = False  # 服务端缓存了这个调用的结果
+    cacheTTL: float | None = None  # 服务端缓存的过期时间(秒)
+    idempotent: bool = False  # 调用是幂等的
+
+class SlowCall(BaseModel):
+    """ 超过阈值的慢调用, 包含各阶段的耗时 """
+    callitem: str  # 调用的函数名
+    requestId: int | None = None  # 请求ID
+    elapsed: float  # 各阶段耗时之和(秒)
+    stages: dict[str, float] = {}  # 阶段 -> 耗时(秒)
+    timestamp: float  # 调用结束的时间 (Unix 时间戳)
 
 class AuthRegisterPayload(BaseModel):
     """ 请求注册的载荷 """
@@ -37,4 +146,29 @@ class AuthRegisterPayload(BaseModel):
 class IdentityClientCard(BaseModel):
     serverAllowed: bool  # 服务器是否允许客户端通过身份验证
     token: str | None # 客户端UUID
-    mode: str = 'auth'  # 身份验证模式，默认为auth
\ No newline at end of file
+    mode: str = 'auth'  # 身份验证模式，默认为auth
+
+def _messageKind(message) -> str:
+    """ 按 kind 字段区分消息类型, 没有 kind 字段的是普通调用 (兼容旧客户端) """
+    if isinstance(message, dict):
+        return message.get('kind', 'call')
+    return getattr(message, 'kind', 'call')
+
+# 客户端发往服务器的消息
+RequestAdapter = TypeAdapter(Annotated[Union[
+    Annotated[RpcRequest, Tag('call')],
+    Annotated[RpcBatchRequest, Tag('batch')],
+    Annotated[RpcStreamCredit, Tag('credit')],
+    Annotated[RpcStreamChunk, Tag('chunk')],
+    Annotated[RpcStreamEnd, Tag('end')],
+    Annotated[RpcCancel, Tag('cancel')],
+], Discriminator(_messageKind)])
+
+# 服务器发往客户端的消息
+ResponseAdapter = TypeAdapter(Annotated[Union[
+    Annotated[RpcResponse, Tag('call')],
+    Annotated[RpcBatchResponse, Tag('batch')],
+    Annotated[RpcStreamChunk, Tag('chunk')],
+    Annotated[RpcStreamEnd, Tag('end')],
+    Annotated[RpcStreamCredit, Tag('credit')],
+], Discriminator(_messageKind)])
@@ -1,48 +1,95 @@
-from ...Interfaces import IRPCHandler
-from ...Models import RpcRequest, RpcResponse, CallType
+from ...Interfaces import IRPCHandler , IRPCInstrument
+from ...Models import RpcRequest, RpcResponse, CallOptions, ExecutionPolicy, PipelineStage
 from ...Utils.logger import getLogger
 from ...Utils import ExtractException
-from typing import Any , Callable
+from ..executor import CallExecutor
+from ..dispatch import DispatchTable
+from ..exceptions import RPCServerError , RPCDeadlineExceededError
+from typing import Any , Callable , AsyncIterator
+import asyncio
+import inspect
+import time
 
 class DefaultHandler(IRPCHandler):
     """ 默认处理器 """
-    def __init__(self, call_items: dict = {}) -> None:
+    def __init__(self, call_items: dict = {}, call_options: dict[str, CallOptions] | None = None, executor: CallExecutor | None = None,
+                 dispatchTable: DispatchTable | None = None, instruments: list[IRPCInstrument] | None = None) -> None:
         self.call_items = call_items # 存储已注册的函数或方法
+        self.call_options = call_options if call_options is not None else {} # 每个函数的执行选项
+        self.executor = executor or CallExecutor() # 负责按执行策略运行函数
+        # 预编译的调用器, 由服务器的注册表传入时与注册表同步更新
+        self.dispatchTable = dispatchTable if dispatchTable is not None else DispatchTable(self.executor, self.call_items, self.call_options)
+        self.instruments = instruments if instruments is not None else [] # 插桩, 由服务器传入时与服务器共享
         self.name = self.__class__.__name__
         self.logger = getLogger(self.__class__.__name__)
         if not self.call_items:
             self.logger.warning("No call items found, please register call items first.")
 
-    def handleRequest(self, request: RpcRequest) -> None:
+    async def handleRequest(self, request: RpcRequest) -> RpcResponse:
         """ 处理请求 """
-        return self._handle(request)
+        return await self._handle(request)
 
-    def _handle(self, request: RpcRequest) -> RpcResponse:
+    async def _handle(self, request: RpcRequest) -> RpcResponse:
         """ 处理请求 """
+        callbody = request.callbody
+        instruments = self.instruments
+        start = time.perf_counter() if instruments else 0.0 # 没有插桩时不计时
+        invoker = self.dispatchTable.get(callbody.callitem)
+        if instruments:
+            start = self._stage(PipelineStage.DISPATCH, request, start)
         try:
-            if request.callbody.callitem in self.call_items:
-                if request.callType == CallType.WITH_NO_ARGS:
-                    result = self.callCanCallable(self.call_items[request.callbody.callitem])
-                elif request.callType == CallType.WITH_ARGS:
-                    result = self.callCanCallable(self.call_items[request.callbody.callitem], *request.callbody.args)
-                elif request.callType == CallType.WITH_KWARGS:
-                    result = self.callCanCallable(self.call_items[request.callbody.callitem], **request.callbody.kwargs)
-                elif request.callType == CallType.WITH_KEY_VALUE_PAIRS:
-                    result = self.callCanCallable(self.call_items[request.callbody.callitem], *request.callbody.args, **request.callbody.kwargs)
-                else:
-                    raise ValueError(f"Invalid callType: {request.callType}")
+            if invoker is None:
+                raise ValueError(f"Call item not found: {callbody.callitem}")
+            if request.timeout is None:
+                result = await self._invoke(request, invoker)
             else:
-                raise ValueError(f"Call item not found: {request.callbody.callitem}")
-            self.logger.success("Request handled successfully. no errors detected.")
-            return RpcResponse(result=result, error=None, is_error=False)
+                # 超过期限时取消调用; THREAD/PROCESS 策略的函数无法中途停止, 结果会被丢弃
+                try:
+                    async with asyncio.timeout(request.timeout) as deadline:
+                        result = await self._invoke(request, invoker)
+                except TimeoutError:
+                    if not deadline.expired():
+                        raise
+                    raise RPCDeadlineExceededError(f"Call {callbody.callitem} exceeded its deadline of {request.timeout:.3f}s") from None
+            return RpcResponse(result=result, error=None)
         except Exception as e:
-            self.logger.info("request handling successful, but an error occurred.")
-            return self.exceptionReturn(e, False)
+            return self.exceptionReturn(e, False) # 调用结果由服务器的访问日志记录
+        finally:
+            if instruments and invoker is not None:
+                self._stage(PipelineStage.EXECUTE, request, start)
 
-    def callCanCallable(self, func: Callable, *args, **kwargs) -> Any:
-        """ 处理函数调用 """
-        self.logger.info(f"Calling function: {func.__name__}, with args: {args}, kwargs: {kwargs}")
-        return func(*args, **kwargs)
+    def _stage(self, stage: PipelineStage, request: RpcRequest, start: float) -> float:
+        """ 通知插桩某个阶段结束, 返回当前时间作为下一个阶段的开始 """
+        now = time.perf_counter()
+        stages = request._stages # 批量调用中的单个调用没有
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + now - start
+        for instrument in self.instruments:
+            instrument.onStage(stage, request, now - start)
+        return now
+
+    async def _invoke(self, request: RpcRequest, invoker: Callable) -> Any:
+        """ 执行调用, 生成器按请求决定是按流返回还是收集为列表 """
+        callbody = request.callbody
+        # 调用类型由参数本身决定, 不再需要按 callType 分支
+        result = await invoker(callbody.args, callbody.kwargs)
+        if inspect.isgenerator(result) or inspect.isasyncgen(result):
+            result = self.iterate(callbody.callitem, result)
+            if not request.stream: # 客户端不接收流, 收集为列表一次返回
+                result = [item async for item in result]
+        return result
+
+    def iterate(self, callitem: str, items) -> AsyncIterator:
+        """ 按注册时的执行策略迭代生成器 """
+        options = self.call_options.get(callitem)
+        policy = options.policy if options is not None else ExecutionPolicy.INLINE
+        return self.executor.iterate(items, policy)
+
+    async def callCanCallable(self, func: Callable, *args, **kwargs) -> Any:
+        """ 按注册时的执行策略调用任意函数 (请求路径使用预编译的调度表) """
+        options = self.call_options.get(func.__name__)
+        policy = options.policy if options is not None else ExecutionPolicy.INLINE
+        return await self.executor.run(func, policy, *args, **kwargs)
 
     def exceptionReturn(self, exception: Exception, log_error: bool = True) -> None:
         """ 返回异常信息 """
@@ -51,4 +98,5 @@ class DefaultHandler(IRPCHandler):
         error += f"\n{stack}"
         if log_error:
             self.logger.error(error) # 记录日志
-        return RpcResponse(result=None, error=error, IsError=True)
\ No newline at end of file
+        code = exception.code if isinstance(exception, RPCServerError) else None # 服务器自身的错误带有分类
+        return RpcResponse(result=None, error=error, IsError=True, code=code)
\ No newline at end of file
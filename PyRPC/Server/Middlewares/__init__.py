@@ -1,4 +1,5 @@
 """ RPC 服务器中间件模块 """
 from ._default import ExampleMiddleware
+from ._ratelimit import RateLimitMiddleware , BucketTable , TokenBucket
 
-__all__ = ['ExampleMiddleware']
\ No newline at end of file
+__all__ = ['ExampleMiddleware', 'RateLimitMiddleware', 'BucketTable', 'TokenBucket']
\ No newline at end of file
@@ -0,0 +1,123 @@
+
+from ...Interfaces import IRPCMiddleWare
+from ...Models import ErrorCode , RateLimit
+from ..pipeline import CallContext
+from collections import OrderedDict
+from typing import Any , Hashable
+import time
+
+class TokenBucket:
+    """ 令牌桶, 按时间差惰性补充令牌, 每次更新都是 O(1) """
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float) -> None:
+        self.tokens = tokens
+        self.updated = updated
+
+    def refill(self, limit: RateLimit, now: float) -> float:
+        self.tokens = min(limit.burst, self.tokens + (now - self.updated) * limit.rate)
+        self.updated = now
+        return self.tokens
+
+class BucketTable:
+    """
+    同一种限制下所有键的令牌桶, 按最近使用排序。
+    空闲超过 idleTimeout 的桶会被淘汰 (它早已补满, 淘汰后重新创建的桶也是满的), 桶的总数不超过 maxBuckets。
+    """
+    def __init__(self, idleTimeout: float = 300.0, maxBuckets: int = 100000) -> None:
+        self.idleTimeout = idleTimeout
+        self.maxBuckets = maxBuckets
+        self.buckets: OrderedDict[Hashable, TokenBucket] = OrderedDict()
+
+    def get(self, key: Hashable, limit: RateLimit, now: float) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(limit.burst, now)
+            self.evict(now)
+        else:
+            self.buckets.move_to_end(key)
+        bucket.refill(limit, now)
+        return bucket
+
+    def evict(self, now: float) -> None:
+        """ 从最久未使用的一端淘汰, 均摊 O(1) """
+        buckets = self.buckets
+        while buckets:
+            key, bucket = next(iter(buckets.items()))
+            if now - bucket.updated < self.idleTimeout and len(buckets) <= self.maxBuckets:
+                break
+            del buckets[key]
+
+    def __len__(self) -> int:
+        return len(self.buckets)
+
+class RateLimitMiddleware(IRPCMiddleWare):
+    """
+    令牌桶限流中间件, 分别按认证身份、客户端地址和可调用对象限流:
+
+    ```
+    server.addMiddleWare(RateLimitMiddleware(
+        perIdentity=RateLimit(rate=50, burst=100), # 每个认证用户 (令牌的 sub)
+        perAddress=RateLimit(rate=20, burst=40), # 每个客户端 IP
+        perCallable={"report": RateLimit(rate=5, burst=5)}, # 每个可调用对象 (所有客户端共享)
+    ))
+    ```
+
+    每次调用从所有适用的桶中各取一个令牌 (批量调用按调用数计算), 任何一个桶不足时都不扣除,
+    直接返回 RATE_LIMITED 错误, retryAfter 是令牌补足所需的时间。
+    超过 burst 的批量调用永远不会被接受, 返回不带 code 的普通错误, 客户端不会重试。
+    """
+    def __init__(self, perIdentity: RateLimit | None = None, perAddress: RateLimit | None = None,
+                 perCallable: dict[str, RateLimit] | RateLimit | None = None,
+                 idleTimeout: float = 300.0, maxBuckets: int = 100000, sequence: int = 0) -> None:
+        super().__init__(sequence)
+        self.perIdentity = perIdentity
+        self.perAddress = perAddress
+        self.perCallable = perCallable # 字典只限制列出的可调用对象, 单个 RateLimit 对每个可调用对象分别生效
+        self.identities = BucketTable(idleTimeout, maxBuckets)
+        self.addresses = BucketTable(idleTimeout, maxBuckets)
+        self.callables = BucketTable(idleTimeout, maxBuckets)
+        self.limited = 0 # 被限流的调用数
+
+    @staticmethod
+    def identityKey(identity: dict | None) -> Any:
+        """ 认证身份的键, 没有认证的连接不按身份限流 """
+        if not identity:
+            return None
+        return identity.get("sub") or identity.get("username")
+
+    def _callableLimit(self, callitem: str) -> RateLimit | None:
+        if isinstance(self.perCallable, RateLimit):
+            return self.perCallable
+        return self.perCallable.get(callitem) if self.perCallable else None
+
+    async def around(self, call: CallContext, next) -> Any:
+        now = time.monotonic()
+        callitems = call.callitems
+        cost = len(callitems)
+        charges: list[tuple[TokenBucket, RateLimit, float]] = []
+        if self.perIdentity is not None:
+            key = self.identityKey(call.identity)
+            if key is not None:
+                charges.append((self.identities.get(key, self.perIdentity, now), self.perIdentity, cost))
+        if self.perAddress is not None and call.client is not None:
+            charges.append((self.addresses.get(call.client.host, self.perAddress, now), self.perAddress, cost))
+        if self.perCallable is not None:
+            for callitem in set(callitems):
+                limit = self._callableLimit(callitem)
+                if limit is not None:
+                    charges.append((self.callables.get(callitem, limit, now), limit, callitems.count(callitem)))
+        # 先检查全部的桶再扣除, 被拒绝的调用不消耗任何令牌
+        retryAfter = 0.0
+        for bucket, limit, amount in charges:
+            if amount > limit.burst: # 桶永远积累不到这么多令牌, 重试也不会成功
+                self.limited += 1
+                return call.reject(f"Call cost {amount} exceeds the rate limit burst of {limit.burst}")
+            if bucket.tokens < amount:
+                retryAfter = max(retryAfter, (amount - bucket.tokens) / limit.rate)
+        if retryAfter > 0:
+            self.limited += 1
+            return call.reject(f"Rate limited, retry after {retryAfter:.3f}s", ErrorCode.RATE_LIMITED, retryAfter)
+        for bucket, _, amount in charges:
+            bucket.tokens -= amount
+        return await next(call)
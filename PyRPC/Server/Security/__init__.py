@@ -1,4 +1,6 @@
 """ 服务器安全模块 """
 from ._default import DefaultRPCAuth
+from ._keys import KeyRing
+from ._cache import VerifiedTokenCache
 
-__all__ = ['DefaultRPCAuth']
\ No newline at end of file
+__all__ = ['DefaultRPCAuth', 'KeyRing', 'VerifiedTokenCache']
\ No newline at end of file
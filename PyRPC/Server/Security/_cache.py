@@ -0,0 +1,54 @@
+
+from collections import OrderedDict
+import hashlib
+import time
+
+def tokenDigest(token: str) -> bytes:
+    """ 令牌的摘要, 缓存中不保存令牌原文 """
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+
+class VerifiedTokenCache:
+    """
+    已验证令牌的有界缓存, 每个条目保留到令牌的 exp 为止。
+    重连风暴中同一个令牌只需要完整验证一次签名。
+    """
+    def __init__(self, maxEntries: int = 10000, defaultTTL: float = 300.0) -> None:
+        self.maxEntries = maxEntries # 最多缓存的令牌数, 超出时淘汰最久未使用的
+        self.defaultTTL = defaultTTL # 没有 exp 的令牌缓存多久(秒)
+        self._entries: OrderedDict[bytes, tuple[float, str | None, dict]] = OrderedDict() # 摘要 -> (过期时间, kid, claims)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, digest: bytes) -> tuple[str | None, dict] | None:
+        """ 取得仍然有效的令牌的 (kid, claims) """
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] <= time.time():
+            del self._entries[digest]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(digest)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, digest: bytes, kid: str | None, claims: dict) -> None:
+        """ 缓存验证通过的令牌 """
+        expire = claims.get("exp")
+        expire = float(expire) if isinstance(expire, (int, float)) else time.time() + self.defaultTTL
+        self._entries[digest] = (expire, kid, claims)
+        self._entries.move_to_end(digest)
+        while len(self._entries) > self.maxEntries:
+            self._entries.popitem(last=False)
+
+    def discard(self, digest: bytes) -> None:
+        self._entries.pop(digest, None)
+
+    def purgeKey(self, kid: str) -> None:
+        """ 移除某个密钥签发的所有令牌 (密钥被移除时调用) """
+        for digest in [digest for digest, entry in self._entries.items() if entry[1] == kid]:
+            del self._entries[digest]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,72 +1,163 @@
 
 from ...Models import  AuthRegisterPayload , IdentityClientCard , MiddleWareStatus
 from ...Interfaces import IRPCMiddleWare
+from ..connection import RPCConnection
+from ._keys import KeyRing
+from ._cache import VerifiedTokenCache , tokenDigest
 from fastapi import WebSocket , FastAPI
+from collections import OrderedDict
 import time
+import os
+import secrets
+import asyncio
 from datetime import timedelta
 from typing import Any
 import jwt
 from ...Utils.logger import getLogger
 from pydantic_core import ValidationError
-import json
+
+SECRET_ENV = "PYRPC_AUTH_SECRET" # 没有指定密钥时从这个环境变量读取, 多个工作进程必须使用相同的密钥
 
 class DefaultRPCAuth(IRPCMiddleWare):
-    """ 默认RPC认证类 """
-    def __init__(self, sequence: int = 1) -> None:
+    """
+    默认RPC认证类, 使用 JWT 令牌:
+
+    ```
+    auth = DefaultRPCAuth(keys=KeyRing({"k1": "secret"}))
+    server.addMiddleWare(auth)
+    auth.keys.rotate("k2", "new secret") # 运行中轮换密钥
+    ```
+
+    验证通过的令牌按摘要缓存到过期为止, 签名和验证在线程中执行, 不阻塞事件循环。
+    认证成功后返回一次性的会话恢复令牌, 重连的客户端用它跳过完整的令牌验证。
+    """
+    def __init__(self, sequence: int = 1, keys: KeyRing | str | None = None, tokenLifetime: timedelta = timedelta(weeks=1),
+                 cacheSize: int = 10000, resumeLifetime: float = 300.0, resumeSize: int = 10000) -> None:
         self.logger = getLogger(self.__class__.__name__)
         self.sequence = sequence
+        if keys is None:
+            keys = os.environ.get(SECRET_ENV)
+            if keys is None:
+                self.logger.warning(f"{SECRET_ENV} is not set, tokens are signed with a random key and will not survive a restart")
+                keys = secrets.token_urlsafe(32)
+        self.keys = keys if isinstance(keys, KeyRing) else KeyRing({"default": keys}) # 签名密钥环
+        self.tokenLifetime = tokenLifetime # 注册时签发的令牌有效期
+        self.verified = VerifiedTokenCache(cacheSize) # 已验证令牌的缓存
+        self.resumeLifetime = resumeLifetime # 会话恢复令牌的有效期(秒)
+        self.resumeSize = resumeSize # 最多保留的会话恢复令牌数
+        self._sessions: OrderedDict[str, tuple[float, str | None, dict]] = OrderedDict() # 恢复令牌 -> (过期时间, kid, claims)
 
-    async def authenticate(self, payload: IdentityClientCard) -> bool:
-        """ 验证客户端请求 """
+    async def verify(self, token: str) -> dict | None:
+        """ 验证令牌, 返回 claims, 无效时返回 None """
+        verified = await self._verify(token)
+        return verified[1] if verified is not None else None
+
+    async def _verify(self, token: str) -> tuple[str | None, dict] | None:
+        """ 验证令牌, 返回 (kid, claims), 无效时返回 None """
+        digest = tokenDigest(token)
+        cached = self.verified.get(digest)
+        if cached is not None:
+            if cached[0] in self.keys.verifyKeys: # 密钥可能已经直接通过 keys.retire 移除
+                return cached
+            self.verified.discard(digest)
         try:
-            jwt.decode(payload.token, "secret", algorithms=["HS256"])
-        except jwt.exceptions.InvalidTokenError:
-            self.logger.info(f"Invalid authentication token: {payload.token}")
-            return False
+            kid, claims = await asyncio.to_thread(self.keys.verify, token)
         except jwt.exceptions.ExpiredSignatureError:
-            self.logger.info(f"Expired authentication token: {payload.token}")
-            return False
-        
+            self.logger.info("Expired authentication token")
+            return None
+        except jwt.exceptions.InvalidTokenError:
+            self.logger.info("Invalid authentication token")
+            return None
+        self.verified.put(digest, kid, claims)
+        return kid, claims
+
+    async def authenticate(self, payload: IdentityClientCard) -> bool:
+        """ 验证客户端请求 """
+        return payload.token is not None and await self.verify(payload.token) is not None
+
+    def retireKey(self, kid: str) -> None:
+        """ 移除旧密钥, 并清除缓存中它签发的令牌和由这些令牌建立的会话 """
+        self.keys.retire(kid)
+        self.verified.purgeKey(kid)
+        for token in [token for token, session in self._sessions.items() if session[1] == kid]:
+            del self._sessions[token]
+
+    def openSession(self, claims: dict, kid: str | None = None) -> str:
+        """ 签发一次性的会话恢复令牌, kid 是原令牌的签名密钥, 密钥移除后会话随之失效 """
+        now = time.time()
+        token = secrets.token_urlsafe(24)
+        expire = min(now + self.resumeLifetime, float(claims.get("exp", now + self.resumeLifetime)))
+        self._sessions[token] = (expire, kid, claims)
+        while len(self._sessions) > self.resumeSize:
+            self._sessions.popitem(last=False)
+        return token
+
+    def resumeSession(self, token: str | None) -> dict | None:
+        """ 使用会话恢复令牌, 令牌用过即失效, 无效或过期时返回 None """
+        session = self._resume(token)
+        return session[1] if session is not None else None
+
+    def _resume(self, token: str | None) -> tuple[str | None, dict] | None:
+        """ 使用会话恢复令牌, 返回 (kid, claims) """
+        session = self._sessions.pop(token, None) if token is not None else None
+        if session is None or session[0] <= time.time():
+            return None
+        if session[1] is not None and session[1] not in self.keys.verifyKeys: # 签名密钥已经移除
+            return None
+        return session[1], session[2]
+
     async def registerUser(self, payload: AuthRegisterPayload) -> IdentityClientCard:
-        """ 注册用户 """
+        """ 注册用户, 令牌中不包含密码 """
         try:
-            expire = time.time() + timedelta(weeks=1).total_seconds()
-            authPayload = jwt.encode({"username": payload.username, "password": payload.password, "exp": expire}, "secret", algorithm="HS256")
+            now = time.time()
+            claims = {"sub": payload.username, "username": payload.username, "iat": int(now), "exp": int(now + self.tokenLifetime.total_seconds())}
+            authPayload = await asyncio.to_thread(self.keys.sign, claims)
             return IdentityClientCard(serverAllowed=True, token=authPayload)
         except Exception as e:
             self.logger.error(f"Failed to register user: {type(e).__name__} - {str(e)}")
             return IdentityClientCard(serverAllowed=False, token=None)
         
-    async def before(self,app: FastAPI, ws: WebSocket, *args, **kwargs) -> tuple[str, MiddleWareStatus]:
+    async def before(self,app: FastAPI, ws: WebSocket, *args, connection: RPCConnection | None = None, **kwargs) -> tuple[str, MiddleWareStatus]:
         """ 客户端连接时调用 """
+        connection = connection or RPCConnection(ws) # 使用握手时协商的编解码器收发认证消息
+        firstAttempt = True # 只允许在第一条消息中注册或恢复会话, 恢复失败之后必须发送完整的令牌
         try:
-            authInfo = await ws.receive_json()
-            authDict: dict = json.loads(authInfo)
-            mode = authDict.get("mode", "")
-            if mode == "register":
-                self.logger.trace(f"Received register request: {authDict}")
-                req = AuthRegisterPayload(**authDict)
-                card = await self.registerUser(req)
-                await ws.send_json(card.model_dump(mode="json"))
-                return "DefaultRPCAuth", MiddleWareStatus.NORMAL
-            elif mode == "auth":
-                self.logger.trace(f"Received authentication request: {authDict}")
-                req = IdentityClientCard(**authDict)
-                if await self.authenticate(req) is False:
-                    self.logger.info("Client authentication failed")
-                    await ws.send_json({"status": "failed", "message": "Unauthorized access"})
-                    return "DefaultRPCAuth", MiddleWareStatus.WANT_TO_CLOSE
-                else:
-                    self.logger.info("Client authentication succeeded")
-                    await ws.send_json({"status": "success", "message": "Authentication succeeded"})
+            while True:
+                authDict: dict = connection.codec.loads(await connection.receive())
+                mode = authDict.get("mode", "")
+                if mode == "register" and firstAttempt:
+                    self.logger.trace(f"Received register request: {authDict}")
+                    req = AuthRegisterPayload.model_validate(authDict)
+                    card = await self.registerUser(req)
+                    await connection.send(card)
                     return "DefaultRPCAuth", MiddleWareStatus.NORMAL
-            else:
-                self.logger.info(f"Invalid authentication mode: {mode}")
-                await ws.send_json({"status": "failed", "message": "Invalid authentication mode"})
-                return "DefaultRPCAuth", MiddleWareStatus.WANT_TO_CLOSE
-        except ValidationError:
+                elif mode == "auth" or (mode == "resume" and firstAttempt):
+                    self.logger.trace(f"Received {mode} request")
+                    req = IdentityClientCard.model_validate(authDict)
+                    # 恢复会话只需要查一次表; 恢复令牌无效时客户端应当重新发送完整的令牌
+                    verified = self._resume(req.token) if mode == "resume" else (await self._verify(req.token) if req.token is not None else None)
+                    kid, claims = verified if verified is not None else (None, None)
+                    if claims is None and mode == "resume": # 会话已过期, 在同一个连接上等待一次完整的认证
+                        self.logger.info("Client session expired, waiting for full authentication")
+                        await connection.sendObject({"status": "expired", "message": "Session expired"})
+                        firstAttempt = False
+                        continue
+                    if claims is None:
+                        self.logger.info(f"Client {mode} failed")
+                        await connection.sendObject({"status": "failed", "message": "Unauthorized access"})
+                        return "DefaultRPCAuth", MiddleWareStatus.WANT_TO_CLOSE
+                    else:
+                        self.logger.info(f"Client {mode} succeeded")
+                        connection.identity = claims
+                        await connection.sendObject({"status": "success", "message": "Authentication succeeded", "resume": self.openSession(claims, kid)})
+                        return "DefaultRPCAuth", MiddleWareStatus.NORMAL
+                else:
+                    self.logger.info(f"Invalid authentication mode: {mode}")
+                    await connection.sendObject({"status": "failed", "message": "Invalid authentication mode"})
+                    return "DefaultRPCAuth", MiddleWareStatus.WANT_TO_CLOSE
+        except (ValidationError, ValueError, AttributeError):
             self.logger.info("Invalid authentication request")
-            await ws.send_json({"status": "failed", "message": "Invalid authentication request"})
+            await connection.sendObject({"status": "failed", "message": "Invalid authentication request"})
             return "DefaultRPCAuth", MiddleWareStatus.WANT_TO_CLOSE
         
     async def after(self,app: FastAPI, ws: WebSocket, *args, **kwargs) -> None:
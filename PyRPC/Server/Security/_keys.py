@@ -0,0 +1,67 @@
+
+from typing import Any
+import jwt
+
+class KeyRing:
+    """
+    签名密钥环, 支持轮换:
+
+    ```
+    keys = KeyRing({"2024-01": "old secret"})
+    keys.rotate("2024-02", "new secret") # 新令牌使用新密钥签名, 旧密钥签发的令牌仍然有效
+    keys.retire("2024-01") # 旧令牌全部过期后移除旧密钥
+    ```
+
+    令牌头部的 kid 指明签名所用的密钥, 验证时直接按 kid 查找, 不需要逐个尝试。
+    非对称算法 (例如 RS256) 的验证密钥通过 verifyKey 单独指定。
+    """
+    def __init__(self, keys: dict[str, Any] | None = None, active: str | None = None, algorithm: str = "HS256") -> None:
+        self.algorithm = algorithm # 签名算法
+        self.signKeys: dict[str, Any] = {} # kid -> 签名密钥
+        self.verifyKeys: dict[str, Any] = {} # kid -> 验证密钥
+        self.active: str | None = None # 当前用于签名的 kid
+        for kid, key in (keys or {}).items():
+            self.add(kid, key)
+        if active is not None:
+            self.activate(active)
+
+    def add(self, kid: str, key: Any, verifyKey: Any | None = None) -> None:
+        """ 添加密钥, 第一个添加的密钥自动成为签名密钥 """
+        self.signKeys[kid] = key
+        self.verifyKeys[kid] = verifyKey if verifyKey is not None else key
+        if self.active is None:
+            self.active = kid
+
+    def activate(self, kid: str) -> None:
+        """ 切换签名密钥 """
+        if kid not in self.signKeys:
+            raise KeyError(f"Unknown signing key: {kid}")
+        self.active = kid
+
+    def rotate(self, kid: str, key: Any, verifyKey: Any | None = None) -> None:
+        """ 添加新密钥并用它签名新令牌 """
+        self.add(kid, key, verifyKey)
+        self.activate(kid)
+
+    def retire(self, kid: str) -> None:
+        """ 移除旧密钥, 它签发的令牌不再有效, 不能移除当前的签名密钥 """
+        if kid == self.active:
+            raise ValueError(f"Cannot retire the active signing key: {kid}")
+        self.signKeys.pop(kid, None)
+        self.verifyKeys.pop(kid, None)
+
+    def sign(self, claims: dict) -> str:
+        """ 用当前密钥签发令牌 """
+        if self.active is None:
+            raise ValueError("KeyRing has no signing key")
+        return jwt.encode(claims, self.signKeys[self.active], algorithm=self.algorithm, headers={"kid": self.active})
+
+    def verify(self, token: str) -> tuple[str | None, dict]:
+        """ 验证令牌, 返回 (kid, claims), 无效或过期时抛出 jwt.InvalidTokenError """
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None: # 没有 kid 的旧令牌, 只尝试当前密钥
+            kid = self.active
+        key = self.verifyKeys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+        return kid, jwt.decode(token, key, algorithms=[self.algorithm])
@@ -2,5 +2,10 @@
 from .backend import RPCServer
 from .Handlers._default import DefaultHandler
 from .remoteCall import RemoteCallable
+from .registry import CallRegistry
+from .admission import AdmissionController
+from .pipeline import CallContext
+from .metrics import ServerMetrics
+from .profiling import SamplingProfiler , SlowCallRecorder
 
-__all__ = ['RPCServer', 'DefaultHandler', 'RemoteCallable']  
\ No newline at end of file
+__all__ = ['RPCServer', 'DefaultHandler', 'RemoteCallable', 'CallRegistry', 'AdmissionController', 'CallContext', 'ServerMetrics', 'SamplingProfiler', 'SlowCallRecorder']  
\ No newline at end of file
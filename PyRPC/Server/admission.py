@@ -0,0 +1,137 @@
+
+from ..Models import CallOptions
+from collections import deque
+import asyncio
+
+class Limiter:
+    """
+    并发限制: 最多 limit 个调用同时执行, 最多 queue 个调用排队等待。
+    排队也满了的调用立即被拒绝, 而不是无限等待, 这样过载时延迟仍然有上界。
+    """
+    def __init__(self, limit: int, queue: int = 0) -> None:
+        self.limit = limit # 同时执行的上限
+        self.queue = queue # 排队等待的上限
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """ 获取一个名额, 需要排队时等待, 排队已满返回 False """
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue:
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled(): # 名额已经转交过来, 转交给下一个等待者
+                self.release()
+            else:
+                self._waiters.remove(waiter)
+            raise
+        return True
+
+    def release(self) -> None:
+        """ 释放名额, 有等待者时直接转交, 执行中的数量不变 """
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+class Admission:
+    """ 一次调用持有的全部名额, 调用结束后释放 """
+    __slots__ = ("limiters",)
+
+    def __init__(self, limiters: list[Limiter]) -> None:
+        self.limiters = limiters
+
+    def release(self) -> None:
+        for limiter in reversed(self.limiters):
+            limiter.release()
+        self.limiters = []
+
+_ADMITTED = Admission([]) # 没有任何限制时共用的空名额
+
+class AdmissionController:
+    """
+    准入控制, 限制连接数以及全局、单个连接和单个可调用对象的在途调用数:
+
+    ```
+    admission = AdmissionController(maxConnections=1000, maxConcurrency=256, maxQueue=512,
+                                    connectionConcurrency=32, connectionQueue=64, queueTimeout=1.0)
+    server = RPCServer(admission=admission)
+
+    @rpc.registerCall(concurrency=8, queue=16) # 单个可调用对象的限制
+    def report(day: str) -> dict: ...
+    ```
+
+    超出限制的调用立即返回 OVERLOADED 错误并携带 retryAfter, 客户端会等待这么久之后重试。
+    所有限制默认关闭。
+    """
+    def __init__(self, maxConnections: int | None = None, maxConcurrency: int | None = None, maxQueue: int = 0,
+                 connectionConcurrency: int | None = None, connectionQueue: int = 0,
+                 queueTimeout: float | None = None, retryAfter: float = 1.0) -> None:
+        self.maxConnections = maxConnections # 最多同时保持的连接数, 超出时以 1013 (Try Again Later) 关闭新连接
+        self.connectionConcurrency = connectionConcurrency # 单个连接的在途调用上限
+        self.connectionQueue = connectionQueue # 单个连接排队等待的调用上限
+        self.queueTimeout = queueTimeout # 排队的最长时间(秒), 超时同样按过载拒绝
+        self.retryAfter = retryAfter # 建议客户端等待多久再重试(秒)
+        self.globalLimiter = Limiter(maxConcurrency, maxQueue) if maxConcurrency is not None else None
+        self._callables: dict[str, tuple[CallOptions, Limiter]] = {}
+        self.rejected = 0 # 被拒绝的调用数
+
+    def acceptConnection(self, connections: int) -> bool:
+        """ 当前已有 connections 个连接时, 是否还能接受新连接 """
+        return self.maxConnections is None or connections < self.maxConnections
+
+    def connectionLimiter(self) -> Limiter | None:
+        """ 为新连接创建的并发限制 """
+        if self.connectionConcurrency is None:
+            return None
+        return Limiter(self.connectionConcurrency, self.connectionQueue)
+
+    def callableLimiter(self, name: str | None, options: CallOptions | None) -> Limiter | None:
+        """ 可调用对象的并发限制, 按注册时的选项创建, 重新注册后跟随新选项 """
+        if options is None or options.concurrency is None:
+            return None
+        cached = self._callables.get(name)
+        if cached is None or cached[0] is not options:
+            cached = self._callables[name] = (options, Limiter(options.concurrency, options.queue))
+        return cached[1]
+
+    async def admit(self, *limiters: Limiter | None, timeout: float | None = None) -> Admission | None:
+        """
+        依次获取各级名额 (连接, 可调用对象, 全局), 任何一级拒绝或排队超时都返回 None。
+        timeout 是调用剩余的期限, 排队时间取它和 queueTimeout 中较小的一个。
+        """
+        limiters = [limiter for limiter in (*limiters, self.globalLimiter) if limiter is not None]
+        if not limiters:
+            return _ADMITTED
+        if timeout is None or (self.queueTimeout is not None and self.queueTimeout < timeout):
+            timeout = self.queueTimeout
+        admission = Admission([])
+        try:
+            async with asyncio.timeout(timeout):
+                # 逐级获取而不是同时排队, 避免两个调用各持有一级名额互相等待
+                for limiter in limiters:
+                    if not await limiter.acquire():
+                        break
+                    admission.limiters.append(limiter)
+        except TimeoutError:
+            pass
+        except asyncio.CancelledError: # 排队期间客户端取消了调用
+            admission.release()
+            raise
+        if len(admission.limiters) < len(limiters):
+            admission.release()
+            self.rejected += 1
+            return None
+        return admission
@@ -1,15 +1,30 @@
 
-from ..Interfaces import IRPCServer , IRPCHandler , IRemoteCallable , IRPCMiddleWare
-from ..Models import RpcRequest , CallableCheckResponse
-from ..Utils.logger import getLogger
+from ..Interfaces import IRPCServer , IRPCHandler , IRemoteCallable , IRPCMiddleWare , IRPCInstrument
+from ..Models import RpcRequest , RpcResponse , RpcBatchRequest , RpcBatchResponse , BatchResult , RequestAdapter , CallableCheckResponse , ErrorCode
+from ..Models import RpcStreamChunk , RpcStreamEnd , RpcStreamCredit , RpcCancel , PipelineStage , SlowCall
+from ..Codecs import codecRegistry , DEFAULT_ATTACHMENT_THRESHOLD , DEFAULT_COMPRESSION_THRESHOLD
+from ..Utils.logger import getLogger , isEnabledFor , AccessLogger
 from .Handlers import DefaultHandler
+from .connection import RPCConnection
+from .executor import CallExecutor
+from .registry import CallRegistry
+from .admission import AdmissionController
+from .metrics import ServerMetrics
+from .profiling import SamplingProfiler , SlowCallRecorder
+from .exceptions import RPCDeadlineExceededError
+from .pipeline import CallContext , CallChain , compileChain , overrides
+from .workers import FACTORY_ENV , APP_FACTORY , ServerFactory , factoryPath
 from starlette.websockets import WebSocketState
 from ..Models import MiddleWareStatus
 import uvicorn
 import inspect
+import time
 import asyncio
-from typing import Callable
-from fastapi import FastAPI, WebSocket
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from fastapi import FastAPI, WebSocket , Request , Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import WebSocketDisconnect
 
@@ -17,15 +32,36 @@ class RPCServer(IRPCServer):
     """
     RPCServer 实现了 IRPCServer 接口，负责处理 RPC 请求，并将请求转发给 IRPCHandler 处理。
     """
-    def __init__(self, debug: bool = False):
+    def __init__(self, debug: bool = False, threadWorkers: int | None = None, processWorkers: int | None = None, codecs: list[str] | None = None,
+                 accessLogSampleRate: float = 0.0, slowCallThreshold: float | None = None, streamWindow: int = 64,
+                 attachmentThreshold: int = DEFAULT_ATTACHMENT_THRESHOLD, compressions: list[str] | None = None,
+                 compressionThreshold: int = DEFAULT_COMPRESSION_THRESHOLD, perMessageDeflate: bool = False,
+                 admission: AdmissionController | None = None, metrics: bool = True, adminEndpoints: bool = False):
         self.handler: IRPCHandler = None
-        self.app = FastAPI()
+        self.accessLog = AccessLogger(accessLogSampleRate, slowCallThreshold) # 采样访问日志
+        self.codecs = codecs if codecs is not None else codecRegistry.available() # 允许协商的编解码器, pickle 等需要显式开启
+        self.executor = CallExecutor(threadWorkers, processWorkers) # 线程池/进程池, 供非 INLINE 策略的函数使用
+        self.compressions = compressions if compressions is not None else codecRegistry.availableCompressions() # 允许协商的应用层压缩算法
+        self.compressionThreshold = compressionThreshold # 超过这个大小的帧才压缩
+        self.perMessageDeflate = perMessageDeflate # WebSocket 层的 permessage-deflate, 会压缩所有帧, 默认关闭
+        self.attachmentThreshold = attachmentThreshold # 二进制编解码器中超过这个大小的 bytes 作为附件帧发送
+        self.streamWindow = streamWindow # 客户端没有指定窗口时, 每个流最多允许的在途数据块数量
+        self.admission = admission or AdmissionController() # 连接数和在途调用数的限制, 默认不限制
+        self.metrics = ServerMetrics() if metrics else None # 从 /metrics 导出的 Prometheus 指标
+        self.instruments: list[IRPCInstrument] = [] # 流水线各阶段的插桩, 为空时不做逐阶段计时
+        self.profiler = SamplingProfiler() # 供 /admin/profile 使用的采样分析器
+        self.adminEndpoints = adminEndpoints # 是否注册 /admin 下的诊断路由, 这些路由没有身份验证, 只应在内网开启
+        self.app = FastAPI(lifespan=self._lifespan)
         self.logger = getLogger(self.__class__.__name__, "TRACE" if debug else "INFO")
         self.middlewares: list[IRPCMiddleWare] = []
+        self._beforeHooks: list[IRPCMiddleWare] = [] # 实现了 before 的中间件
+        self._afterHooks: list[IRPCMiddleWare] = [] # 实现了 after 的中间件
+        self._callChain: CallChain | None = None # 编译后的逐调用中间件链, None 表示直接调用处理器
         self.registed_callables: dict[str, IRemoteCallable] = {}
-        self.clients = []
-        self.infoCache = None
+        self.clients: set[WebSocket] = set()
+        self.registry = CallRegistry(self.executor) # 调度表和元数据索引, 注册和注销时增量更新
         self.debug = debug
+        self._prepared = False # 路由只注册一次
         self.headers = {
             "User-Agent": "Python RPC Server / backend / FastAPI"
         }
@@ -45,16 +81,15 @@ class RPCServer(IRPCServer):
             # 处理关闭连接时可能发生的任何异常
             self.logger.exception(f"Error while closing connection: {e}")
         finally:
-            if ws in self.clients:
-                self.clients.remove(ws)
+            self.clients.discard(ws)
 
-    async def openConnection(self, ws: WebSocket) -> WebSocket:
+    async def openConnection(self, ws: WebSocket, subprotocol: str | None = None) -> WebSocket:
         if await self.isConnected(ws):
             self.logger.info(f"WebSocket connection already exists: {ws.client}")
             return ws
         else:
-            await ws.accept()
-            self.clients.append(ws)
+            await ws.accept(subprotocol=subprotocol)
+            self.clients.add(ws)
             self.logger.info(f"WebSocket connection opened: {ws.client}")
             return ws
 
@@ -72,8 +107,43 @@ class RPCServer(IRPCServer):
         """ 添加中间件 """
         self.middlewares.append(middleware)
         self.middlewares.sort(key=lambda x: x.sequence)  # 根据优先级排序
+        self._compileMiddlewares()
         self.logger.info(f"MiddleWare {middleware.__class__.__name__} added.")
 
+    def addInstrument(self, instrument: IRPCInstrument) -> None:
+        """ 添加插桩, 运行中也可以调用 """
+        self.instruments.append(instrument)
+
+    def removeInstrument(self, instrument: IRPCInstrument) -> None:
+        """ 移除插桩 """
+        if instrument in self.instruments:
+            self.instruments.remove(instrument)
+
+    def slowCalls(self) -> list[SlowCall]:
+        """ 所有 SlowCallRecorder 记录的慢调用, 按结束时间排序 """
+        calls = [call for instrument in self.instruments if isinstance(instrument, SlowCallRecorder) for call in instrument.records()]
+        return sorted(calls, key=lambda call: call.timestamp)
+
+    def _stage(self, stage: PipelineStage, request: RpcRequest, elapsed: float) -> None:
+        """ 累计这次调用的阶段耗时并通知插桩 """
+        stages = request._stages
+        if stages is not None:
+            stages[stage] = stages.get(stage, 0.0) + elapsed
+        for instrument in self.instruments:
+            instrument.onStage(stage, request, elapsed)
+
+    def _compileMiddlewares(self) -> None:
+        """ 把中间件编译成各个阶段的扁平列表和调用链, 跳过没有实现的钩子 """
+        self._beforeHooks = [middleware for middleware in self.middlewares if overrides(middleware, "before")]
+        self._afterHooks = [middleware for middleware in self.middlewares if overrides(middleware, "after")]
+        self._callChain = compileChain(self.middlewares, self._terminal)
+
+    async def _terminal(self, call: CallContext) -> RpcResponse | RpcBatchResponse:
+        """ 调用链的最后一环, 交给处理器执行 """
+        if isinstance(call.request, RpcBatchRequest):
+            return await self.handler.handleBatch(call.request)
+        return await self.handler.handleRequest(call.request)
+
     def setHandler(self, handler: IRPCHandler) -> None:
         self.handler = handler
         self.logger.info(f"Handler {handler.__class__.__name__} setered to server")
@@ -83,53 +153,85 @@ class RPCServer(IRPCServer):
             self.handler = None
             self.logger.info(f"Handler {name} removed from server")
 
-    def run(self, host: str = "127.0.0.1", port: int = 8000) -> None:
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI) -> AsyncIterator[None]:
+        """ 应用的生命周期, 工作进程退出时关闭线程池和进程池 """
+        yield
+        self.executor.shutdown()
+
+    def prepare(self) -> FastAPI:
+        """ 设置默认处理器并注册路由, 返回可以交给任意 ASGI 服务器运行的应用 """
+        if self._prepared:
+            return self.app
         if self.handler is None:
             self.logger.warning("No handler set, server will use a default handler")
-            self.handler = DefaultHandler(self._parseCall())
-
-        self.logger.info(f"Starting server on ws://{host}:{port})")
+            self.handler = DefaultHandler(self.registry.callitems, self.registry.calloptions, self.executor, self.registry.dispatchTable, self.instruments)
         self.handle() # 在启动之前先注册路由
+        self._compileMiddlewares()
+        self._prepared = True
+        return self.app
+
+    def run(self, host: str = "127.0.0.1", port: int = 8000, workers: int = 1, factory: str | ServerFactory | None = None,
+            gracefulTimeout: float | None = 30.0) -> None:
+        """
+        启动服务器。workers 大于 1 时由主进程监听端口并预先创建工作进程, 所有工作进程共享同一个监听套接字。
+        工作进程通过 factory ("module:build" 或模块级函数) 重新创建服务器和注册表,
+        向主进程发送 SIGHUP 会逐个替换工作进程 (新进程就绪后才停止旧进程), 用于滚动重启。
+        """
+        logLevel = "debug" if self.debug else "critical"
         if self.debug:
             self.logger.warning("Debug mode is on, server will not be started in production environment")
-            uvicorn.run(self.app, host=host, port=port, log_level="debug")
+        if workers > 1:
+            if factory is None:
+                raise ValueError("Running with multiple workers requires a server factory to rebuild the registry in each worker")
+            os.environ[FACTORY_ENV] = factoryPath(factory)
+            self.logger.info(f"Starting server on ws://{host}:{port} with {workers} workers, factory: {os.environ[FACTORY_ENV]}")
+            uvicorn.run(APP_FACTORY, factory=True, host=host, port=port, workers=workers, log_level=logLevel,
+                        ws_per_message_deflate=self.perMessageDeflate, timeout_graceful_shutdown=gracefulTimeout)
         else:
-            uvicorn.run(self.app, host=host, port=port, log_level="critical")
+            self.logger.info(f"Starting server on ws://{host}:{port}")
+            uvicorn.run(self.prepare(), host=host, port=port, log_level=logLevel,
+                        ws_per_message_deflate=self.perMessageDeflate, timeout_graceful_shutdown=gracefulTimeout)
+        self.executor.shutdown()
         self.logger.info("Server stopped")
 
     def addCallItem(self, item: IRemoteCallable) -> None:
         self.logger.debug(f"Adding callItem {item.name}, callable: {item.callitems}")
         if item.name in self.registed_callables:
             self.logger.warning(f"CallItem {item.name} already exists, overwriting")
+            self.registry.removeCallItem(self.registed_callables[item.name])
         self.registed_callables[item.name] = item
+        self.registry.addCallItem(item)
+
+    def removeCallItem(self, name: str) -> None:
+        """ 移除 RemoteCallable 及其所有函数, 运行中也可以调用 """
+        item = self.registed_callables.pop(name, None)
+        if item is not None:
+            self.registry.removeCallItem(item)
+
+    def invalidateCache(self, callitem: str, args: tuple | None = None, kwargs: dict | None = None) -> None:
+        """ 使某个调用的结果缓存失效, 不指定参数时清空这个调用的全部缓存 """
+        self.registry.dispatchTable.invalidate(callitem, args, kwargs)
+
+    def cacheStats(self) -> dict[str, dict]:
+        """ 结果缓存的命中统计 """
+        return self.registry.dispatchTable.cacheStats()
 
-    def _parseCall(self) -> dict[str, Callable]:
-        calls = {}
-        for _, item in self.registed_callables.items():
-            for call_name , call_able in item.callitems.items():
-                calls[call_name] = call_able
-        self.logger.debug(f"Calls: {calls}")
-        return calls
-    
     def getAllCallInfos(self) -> list[CallableCheckResponse]:
-        self.logger.debug("Getting all call infos")
-        result: list[CallableCheckResponse] = []
-        for _, item in self.registed_callables.items():
-            for callName, callAble in item.callitems.items():
-                parameters = inspect.signature(callAble).parameters
-                pType = callAble.__annotations__
-                pInfo = [{"name": k, "type": pType.get(k, "Any").__name__} for k in parameters.keys()]
-                pDictInfo = {k: pType.get(k, "Any").__name__ for k in parameters.keys()}
-                result.append(CallableCheckResponse(callName=callName, requireArgs=tuple(pInfo), requireKwargs=pDictInfo, returnType=pType.get("return", "Any").__name__))
-        return result
+        """ 所有可调用对象的元数据, 由注册表在注册时生成 """
+        return list(self.registry.infos.values())
+
+    def _metricName(self, callitem: str) -> str:
+        """ 指标中使用的调用名, 未注册的调用名合并在一起, 避免客户端制造任意多的标签 """
+        return callitem if callitem in self.registry.callitems else "<unknown>"
     
     async def _beforeHandle(self, ws: WebSocket, *args, **kwargs) -> tuple[WebSocket, MiddleWareStatus]:
         self.logger.trace(f"Before handle, client: {ws.client}")
         """ 在处理请求之前调用 """
-        if len(self.middlewares) == 0:
+        if len(self._beforeHooks) == 0:
             self.logger.debug("No middlewares, accept connection directly")
             return ws , MiddleWareStatus.NORMAL
-        for middleware in self.middlewares:
+        for middleware in self._beforeHooks:
             self.logger.trace(f"Middleware {middleware.__class__.__name__} before handle")
             middlewareReturn = await middleware.before(app=self.app, ws=ws, *args, **kwargs)
             if middlewareReturn[1] == MiddleWareStatus.WANT_TO_CLOSE:
@@ -146,9 +248,7 @@ class RPCServer(IRPCServer):
     async def _afterHandle(self, ws: WebSocket, status: str, *args, **kwargs) -> None:
         self.logger.trace(f"After handle, client: {ws.client}")
         """ 在处理请求之后调用 """
-        if len(self.middlewares) == 0:
-            await self._after(ws, status)
-        for middleware in self.middlewares:
+        for middleware in self._afterHooks:
             self.logger.trace(f"Middleware {middleware.__class__.__name__} after handle")
             await middleware.after(app=self.app, ws=ws, *args, **kwargs)
         await self._after(ws, status)
@@ -162,37 +262,278 @@ class RPCServer(IRPCServer):
             self.logger.info(f"Client {ws.client} disconnected with error")
             return await self.closeConnection(ws, reason="invoke completed with error")
 
-    async def _handle(self, websocket: WebSocket, middlewareStatus: MiddleWareStatus, *args, **kwargs) -> tuple[WebSocket, str]:
+    async def _handle(self, websocket: WebSocket, middlewareStatus: MiddleWareStatus, *args, connection: RPCConnection | None = None, **kwargs) -> tuple[WebSocket, str]:
         """ 处理请求 """
         if middlewareStatus == MiddleWareStatus.WANT_TO_CLOSE:
             return websocket, MiddleWareStatus.WANT_TO_CLOSE # 如果是关闭请求，则不进行处理
         
-        self.clients.append(websocket)
+        self.clients.add(websocket)
         self.logger.info(f"New client connected: {websocket.client}")
+        connection = connection or RPCConnection(websocket)
         try:
             while True:
-                data = await websocket.receive_json()
-                rpcReq = RpcRequest.model_validate_json(data)
-                self.logger.debug(f"Received request: {rpcReq.model_dump(mode='json')}")
-                response = self.handler.handleRequest(rpcReq)
-                await websocket.send_json(response.model_dump(mode="json"))
+                rpcReq = await connection.receiveModel(RequestAdapter)
+                if isinstance(rpcReq, RpcStreamCredit): # 流控消息直接处理, 不创建任务
+                    connection.grant(rpcReq.requestId, rpcReq.credit, rpcReq.close)
+                    continue
+                if isinstance(rpcReq, (RpcStreamChunk, RpcStreamEnd)): # 客户端上传的数据块
+                    connection.feed(rpcReq)
+                    continue
+                if isinstance(rpcReq, RpcCancel): # 客户端放弃了调用, 停止在途的任务
+                    connection.cancel(rpcReq.requestId)
+                    continue
+                if isEnabledFor("DEBUG"): # 级别守卫, 避免每个请求都格式化消息
+                    self.logger.debug(f"Received request: {rpcReq}")
+                if self.metrics is not None and isinstance(rpcReq, RpcRequest):
+                    self.metrics.observe(self._metricName(rpcReq.callbody.callitem), "decode", connection.decodeTime)
+                if self.instruments and isinstance(rpcReq, RpcRequest):
+                    rpcReq._stages = {} # 阶段耗时保存在请求上, 随请求一起释放
+                    self._stage(PipelineStage.VALIDATE, rpcReq, connection.decodeTime)
+                    if rpcReq.attachments:
+                        self._stage(PipelineStage.RECEIVE, rpcReq, connection.receiveTime)
+                # 每个请求作为独立任务执行, 响应按完成顺序写回, 由请求ID进行匹配
+                if isinstance(rpcReq, RpcBatchRequest):
+                    task = asyncio.create_task(self._admitted(connection, rpcReq, None, self._dispatchBatch))
+                elif rpcReq.upload:
+                    # 必须在读取下一帧之前登记, 否则紧随其后的数据块会被丢弃
+                    inbound = connection.openUpload(rpcReq.requestId, self.streamWindow)
+                    rpcReq.callbody.args = (inbound, *rpcReq.callbody.args)
+                    task = asyncio.create_task(self._admitted(connection, rpcReq, rpcReq.callbody.callitem, self._dispatchUpload, inbound))
+                else:
+                    task = asyncio.create_task(self._admitted(connection, rpcReq, rpcReq.callbody.callitem, self._dispatch))
+                connection.track(rpcReq.requestId, task)
         except WebSocketDisconnect: # 如果是正常断开连接，则正常退出
+            connection.cancelAll() # 客户端已断开, 在途请求的结果无人接收
             status = MiddleWareStatus.NORMAL
         except Exception as e: # 如果是其他异常，则记录日志，关闭连接
             self.logger.exception(f"Error while handling request: {e}")
+            connection.abortStreams("connection closed after a malformed frame") # 信用和上传的数据块都不会再到达
+            await connection.drain()
             status = "Error exit"
         return websocket, status
 
+    async def _admitted(self, connection: RPCConnection, rpcReq: RpcRequest | RpcBatchRequest, callitem: str | None, dispatch, *args) -> None:
+        """ 通过准入控制之后再执行请求, 超出限制时立即返回过载错误 (批量请求只受连接和全局限制) """
+        limiter = self.admission.callableLimiter(callitem, self.registry.calloptions.get(callitem)) if callitem is not None else None
+        timeout = getattr(rpcReq, "timeout", None)
+        start = time.perf_counter()
+        try:
+            admission = await self.admission.admit(connection.limiter, limiter, timeout=timeout)
+            if admission is None:
+                if timeout is not None and time.perf_counter() - start >= timeout: # 在排队中耗尽了期限
+                    return await self._expire(connection, rpcReq, *args)
+                return await self._reject(connection, rpcReq, *args)
+            if timeout is not None: # 排队的时间也计入期限
+                rpcReq.timeout = max(0.0, timeout - (time.perf_counter() - start))
+            if callitem is not None:
+                if self.metrics is not None:
+                    self.metrics.observe(self._metricName(callitem), "queue", time.perf_counter() - start)
+                if self.instruments:
+                    self._stage(PipelineStage.QUEUE, rpcReq, time.perf_counter() - start)
+            try:
+                await dispatch(connection, rpcReq, *args)
+            finally:
+                admission.release()
+        finally:
+            if callitem is not None: # 无论调用是完成、被拒绝还是被取消, 插桩都会收到调用结束
+                stages = rpcReq._stages
+                if stages is not None:
+                    for instrument in self.instruments:
+                        instrument.onCallEnd(rpcReq, stages)
+
+    async def _reject(self, connection: RPCConnection, rpcReq: RpcRequest | RpcBatchRequest, inbound=None) -> None:
+        """ 返回过载错误, 携带建议的重试等待时间 """
+        retryAfter = self.admission.retryAfter
+        error = f"Server overloaded, retry after {retryAfter}s"
+        if isinstance(rpcReq, RpcBatchRequest):
+            results = [BatchResult(error=error, IsError=True, code=ErrorCode.OVERLOADED, retryAfter=retryAfter) for _ in rpcReq.calls]
+            response = RpcBatchResponse(requestId=rpcReq.requestId, results=results)
+        else:
+            response = RpcResponse(requestId=rpcReq.requestId, result=None, error=error, IsError=True, code=ErrorCode.OVERLOADED, retryAfter=retryAfter)
+        if inbound is not None: # 拒绝的上传不再接收数据块
+            connection.closeUpload(rpcReq.requestId)
+        if isEnabledFor("DEBUG"):
+            self.logger.debug(f"Rejected request {rpcReq.requestId} from {connection.client}: overloaded")
+        try:
+            await connection.send(response)
+        except (WebSocketDisconnect, RuntimeError):
+            self.logger.debug(f"Client {connection.client} gone before overload response {rpcReq.requestId} was sent")
+
+    async def _expire(self, connection: RPCConnection, rpcReq: RpcRequest, inbound=None) -> None:
+        """ 调用在排队时就超过了期限 """
+        response = self.handler.exceptionReturn(RPCDeadlineExceededError(f"Call {rpcReq.callbody.callitem} exceeded its deadline of {rpcReq.timeout:.3f}s while queued"), False)
+        response.requestId = rpcReq.requestId
+        if inbound is not None:
+            connection.closeUpload(rpcReq.requestId)
+        try:
+            await connection.send(response)
+        except (WebSocketDisconnect, RuntimeError):
+            self.logger.debug(f"Client {connection.client} gone before deadline response {rpcReq.requestId} was sent")
+
+    async def _dispatch(self, connection: RPCConnection, rpcReq: RpcRequest) -> None:
+        """ 执行单个请求并写回响应 """
+        metrics = self.metrics
+        name = self._metricName(rpcReq.callbody.callitem) if metrics is not None else None
+        if metrics is not None:
+            metrics.started(name)
+        start = time.perf_counter()
+        try:
+            chain = self._callChain
+            response = await (self.handler.handleRequest(rpcReq) if chain is None else chain(CallContext(connection, rpcReq)))
+        except Exception as e:
+            response = self.handler.exceptionReturn(e)
+        except asyncio.CancelledError: # 客户端取消或断开, 调用没有完成
+            if metrics is not None:
+                metrics.finished(name, True)
+            raise
+        if rpcReq.stream and inspect.isasyncgen(response.result):
+            return await self._stream(connection, rpcReq, response.result, start, name)
+        elapsed = time.perf_counter() - start
+        self.accessLog.log(connection.client, rpcReq.callbody.callitem, elapsed, response.IsError)
+        if metrics is not None:
+            metrics.observe(name, "execute", elapsed)
+            metrics.finished(name, response.IsError)
+        response.requestId = rpcReq.requestId
+        try:
+            encodeTime, sendTime = await connection.send(response)
+        except (WebSocketDisconnect, RuntimeError):
+            self.logger.debug(f"Client {connection.client} gone before response {rpcReq.requestId} was sent")
+            return
+        if metrics is not None:
+            metrics.observe(name, "encode", encodeTime)
+        if self.instruments:
+            self._stage(PipelineStage.SERIALIZE, rpcReq, encodeTime)
+            self._stage(PipelineStage.SEND, rpcReq, sendTime)
+
+    async def _dispatchUpload(self, connection: RPCConnection, rpcReq: RpcRequest, inbound) -> None:
+        """ 授予客户端初始信用, 然后像普通请求一样执行 (双向流时结果也按流返回) """
+        try:
+            await connection.send(RpcStreamCredit(requestId=rpcReq.requestId, credit=inbound.window))
+            await self._dispatch(connection, rpcReq)
+        except (WebSocketDisconnect, RuntimeError):
+            self.logger.debug(f"Client {connection.client} gone during upload {rpcReq.requestId}")
+        finally:
+            connection.closeUpload(rpcReq.requestId)
+
+    async def _stream(self, connection: RPCConnection, rpcReq: RpcRequest, items, start: float, name: str | None = None) -> None:
+        """ 按信用逐块发送生成器的结果, 最后发送结束帧, name 是指标中的调用名 (执行阶段覆盖整个流) """
+        window = rpcReq.window or self.streamWindow # 窗口限制的是接收方的缓存, 由客户端决定
+        gate = connection.openStream(rpcReq.requestId, window)
+        end = RpcStreamEnd(requestId=rpcReq.requestId)
+        streamStart = time.perf_counter() # 处理器已经记录了创建生成器的耗时
+        remaining = None if rpcReq.timeout is None else max(0.0, rpcReq.timeout - (streamStart - start))
+        gone = False # 客户端已经断开, 不再发送结束帧
+        try:
+            async with asyncio.timeout(remaining) as deadline: # 期限覆盖整个流
+                # 先获取信用再生成下一项, 客户端消费慢时生成器也会暂停
+                while await gate.acquire():
+                    try:
+                        item = await anext(items)
+                    except StopAsyncIteration:
+                        break
+                    try:
+                        await connection.send(RpcStreamChunk.model_construct(kind="chunk", requestId=rpcReq.requestId, data=item))
+                    except (WebSocketDisconnect, RuntimeError): # 只有发送失败才说明客户端断开, 生成器的异常按错误返回
+                        gone = end.IsError = True
+                        break
+                    end.count += 1
+        except TimeoutError as e:
+            error = self.handler.exceptionReturn(RPCDeadlineExceededError(f"Stream {rpcReq.callbody.callitem} exceeded its deadline of {rpcReq.timeout:.3f}s") if deadline.expired() else e, False)
+            end.error, end.IsError, end.code = error.error, True, error.code
+        except Exception as e:
+            error = self.handler.exceptionReturn(e)
+            end.error, end.IsError = error.error, True
+        except asyncio.CancelledError:
+            end.IsError = True
+            raise
+        finally:
+            connection.closeStream(rpcReq.requestId)
+            await items.aclose()
+            if name is not None:
+                self.metrics.observe(name, "execute", time.perf_counter() - start)
+                self.metrics.finished(name, end.IsError)
+            if self.instruments:
+                self._stage(PipelineStage.EXECUTE, rpcReq, time.perf_counter() - streamStart)
+        if gone:
+            self.logger.debug(f"Client {connection.client} gone during stream {rpcReq.requestId}")
+            return
+        self.accessLog.log(connection.client, rpcReq.callbody.callitem, time.perf_counter() - start, end.IsError)
+        try:
+            await connection.send(end)
+        except (WebSocketDisconnect, RuntimeError):
+            self.logger.debug(f"Client {connection.client} gone before stream {rpcReq.requestId} ended")
+
+    async def _dispatchBatch(self, connection: RPCConnection, rpcReq: RpcBatchRequest) -> None:
+        """ 执行批量请求, 所有结果在一帧中写回 """
+        start = time.perf_counter()
+        chain = self._callChain
+        try:
+            response = await (self.handler.handleBatch(rpcReq) if chain is None else chain(CallContext(connection, rpcReq)))
+        except Exception as e: # 中间件出错时整个批量调用都返回这个错误
+            response = CallContext(connection, rpcReq).reject(self.handler.exceptionReturn(e).error)
+        elapsed = time.perf_counter() - start
+        for body, result in zip(rpcReq.calls, response.results):
+            self.accessLog.log(connection.client, body.callitem, elapsed, result.IsError)
+            if self.metrics is not None: # 批量调用中的单个调用只计数, 阶段耗时无法拆分
+                self.metrics.count(self._metricName(body.callitem), result.IsError)
+        try:
+            await connection.send(response)
+        except (WebSocketDisconnect, RuntimeError):
+            self.logger.debug(f"Client {connection.client} gone before batch response {rpcReq.requestId} was sent")
+
     def handle(self) -> None:
         @self.app.get("/rpc/callables")
-        async def get_callables():
-            if not self.infoCache:
-                self.infoCache = await asyncio.to_thread(self.getAllCallInfos)
-            return self.infoCache
+        async def get_callables(request: Request):
+            etag = self.registry.etag # 由目录内容计算, 注册表变化时随之改变
+            if request.headers.get("if-none-match") == etag: # 客户端缓存的目录仍然有效
+                return Response(status_code=304, headers={"ETag": etag})
+            return JSONResponse(self.registry.catalogue(), headers={"ETag": etag})
+
+        if self.metrics is not None:
+            @self.app.get("/metrics")
+            async def get_metrics():
+                # 在事件循环中生成, 读取的是一致的快照
+                return Response(self.metrics.render(len(self.clients)), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+        if self.adminEndpoints:
+            @self.app.get("/admin/profile")
+            async def get_profile(seconds: float = 10.0, interval: float = 0.005):
+                # 采样在线程中进行, 事件循环照常处理请求, 采样到的就是线上真实的调用栈
+                if self.profiler.running:
+                    return Response("A profile is already running\n", status_code=409, media_type="text/plain")
+                try:
+                    counts = await asyncio.to_thread(self.profiler.sample, seconds, interval)
+                except RuntimeError as e: # 两个请求同时到达
+                    return Response(f"{e}\n", status_code=409, media_type="text/plain")
+                return Response(self.profiler.render(counts), media_type="text/plain; charset=utf-8")
+
+            @self.app.get("/admin/slowcalls")
+            async def get_slow_calls():
+                return JSONResponse([call.model_dump(mode="json") for call in self.slowCalls()])
         
         @self.app.websocket("/ws/rpc")
         async def websocket_endpoint(websocket: WebSocket):
-            opened_ws = await self.openConnection(websocket)
-            before_ws , middlewareStatus = await self._beforeHandle(opened_ws) 
-            handled_ws, status = await self._handle(before_ws, middlewareStatus)
-            await self._afterHandle(handled_ws, status)
\ No newline at end of file
+            # 通过子协议协商编解码器, 没有提供子协议的客户端 (例如浏览器) 使用 JSON
+            codec, subprotocol = codecRegistry.negotiate(websocket.scope.get("subprotocols", []), self.codecs, self.compressions, self.compressionThreshold)
+            if not self.admission.acceptConnection(len(self.clients)):
+                # 连接数已满, 握手之后立即以 1013 (Try Again Later) 关闭
+                await websocket.accept(subprotocol=subprotocol)
+                await websocket.close(code=1013, reason="Server overloaded, try again later")
+                self.logger.warning(f"Connection limit {self.admission.maxConnections} reached, rejected {websocket.client}")
+                return
+            opened_ws = await self.openConnection(websocket, subprotocol)
+            try:
+                connection = RPCConnection(opened_ws, codec, self.attachmentThreshold)
+                connection.limiter = self.admission.connectionLimiter()
+                if self.metrics is not None:
+                    connection.metrics = self.metrics
+                    self.metrics.connectionsTotal += 1
+                before_ws , middlewareStatus = await self._beforeHandle(opened_ws, connection=connection) 
+                handled_ws, status = await self._handle(before_ws, middlewareStatus, connection=connection)
+                await self._afterHandle(handled_ws, status)
+            except WebSocketDisconnect: # 例如客户端在认证握手期间断开
+                self.logger.debug(f"Client {opened_ws.client} disconnected before the connection was handled")
+            finally:
+                # 中间件或处理过程抛出异常时 _afterHandle 不会执行, 仍然要关闭连接, 否则它会一直占用连接数
+                if opened_ws in self.clients:
+                    await self.closeConnection(opened_ws, code=1011, reason="connection aborted")
\ No newline at end of file
@@ -0,0 +1,205 @@
+
+from ..Interfaces import IRPCCodec
+from ..Codecs import codecRegistry , detachAttachments , attachAttachments , DEFAULT_ATTACHMENT_THRESHOLD
+from ..Models import RpcStreamChunk , RpcStreamEnd , RpcStreamCredit
+from ..Utils.flow import CreditGate
+from .exceptions import RPCServerError , RPCStreamAbortedError
+from pydantic import BaseModel , TypeAdapter
+from fastapi import WebSocket , WebSocketDisconnect
+from typing import Any , Iterator
+import asyncio
+import time
+
+class InboundStream:
+    """
+    客户端上传的流, 作为第一个参数交给可调用对象。
+    协程函数用 `async for` 消费, THREAD 策略的普通函数可以直接用 `for` 消费。
+    每消费半个窗口就向客户端授予同样多的信用。
+    """
+    def __init__(self, connection: "RPCConnection", requestId: int | None, window: int) -> None:
+        self.connection = connection
+        self.requestId = requestId
+        self.window = window
+        self.queue: asyncio.Queue = asyncio.Queue() # 客户端按信用发送, 队列长度不会超过窗口
+        self.loop = asyncio.get_running_loop()
+        self.ended = False
+        self._every = max(1, window // 2)
+        self._consumed = 0
+
+    def __aiter__(self) -> "InboundStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self.ended:
+            raise StopAsyncIteration
+        message = await self.queue.get()
+        if isinstance(message, RpcStreamEnd):
+            self.ended = True
+            if message.IsError:
+                raise RPCStreamAbortedError(f"Client aborted the upload: {message.error}")
+            raise StopAsyncIteration
+        self._consumed += 1
+        if self._consumed >= self._every:
+            credit, self._consumed = self._consumed, 0
+            await self.connection.send(RpcStreamCredit(requestId=self.requestId, credit=credit))
+        return message.data
+
+    def __iter__(self) -> Iterator:
+        """ 在工作线程中同步消费, 每一项都交给事件循环去等待 """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RPCServerError("Client streams can only be consumed synchronously with ExecutionPolicy.THREAD, use an async function instead")
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(self.__anext__(), self.loop).result()
+            except StopAsyncIteration:
+                return
+
+class RPCConnection:
+    """ 单个 WebSocket 连接的上下文, 负责编解码、并发发送和在途请求管理 """
+    def __init__(self, ws: WebSocket, codec: IRPCCodec | None = None, attachmentThreshold: int = DEFAULT_ATTACHMENT_THRESHOLD) -> None:
+        self.ws = ws
+        self.codec = codec or codecRegistry.get(codecRegistry.default) # 握手时协商的编解码器
+        self.attachmentThreshold = attachmentThreshold # 超过这个大小的 bytes 作为二进制附件帧发送
+        self.sendLock = asyncio.Lock() # 多个请求任务并发写回时保证帧不交错
+        self.tasks: dict[int, asyncio.Task] = {} # 在途请求, 以请求ID为键
+        self.streams: dict[int, CreditGate] = {} # 正在发送的流, 以请求ID为键
+        self.uploads: dict[int, InboundStream] = {} # 正在接收的客户端流, 以请求ID为键
+        self.limiter = None # 单个连接的在途调用限制, 由服务器的准入控制创建
+        self.identity: dict | None = None # 认证通过的客户端身份 (令牌的 claims)
+        self.metrics = None # 服务器指标, 用于统计收发的字节数
+        self.decodeTime = 0.0 # 最近一条消息的解码耗时(秒)
+        self.receiveTime = 0.0 # 最近一条消息读取附件帧的耗时(秒)
+        self._anonymousId = 0
+
+    @property
+    def client(self):
+        return self.ws.client
+
+    def track(self, requestId: int | None, task: asyncio.Task) -> None:
+        """ 登记在途请求任务, 任务完成后自动移除 """
+        if requestId is None:
+            # 旧客户端不携带请求ID, 使用负数作为内部键避免与客户端ID冲突
+            self._anonymousId -= 1
+            requestId = self._anonymousId
+        self.tasks[requestId] = task
+        task.add_done_callback(lambda _: self.tasks.pop(requestId, None))
+
+    def openStream(self, requestId: int | None, credit: int) -> CreditGate:
+        """ 开始发送一个流 """
+        gate = CreditGate(credit)
+        if requestId is not None:
+            self.streams[requestId] = gate
+        return gate
+
+    def closeStream(self, requestId: int | None) -> None:
+        self.streams.pop(requestId, None)
+
+    def grant(self, requestId: int | None, credit: int, close: bool = False) -> None:
+        """ 处理接收方发来的信用, 未知的流直接忽略 (可能已经结束) """
+        gate = self.streams.get(requestId)
+        if gate is None:
+            return
+        if close:
+            gate.close()
+        else:
+            gate.grant(credit)
+
+    def openUpload(self, requestId: int | None, window: int) -> InboundStream:
+        """ 开始接收客户端上传的流 """
+        inbound = InboundStream(self, requestId, window)
+        if requestId is not None:
+            self.uploads[requestId] = inbound
+        return inbound
+
+    def closeUpload(self, requestId: int | None) -> None:
+        self.uploads.pop(requestId, None)
+
+    def feed(self, message: RpcStreamChunk | RpcStreamEnd) -> None:
+        """ 把客户端发来的数据块交给对应的流, 调用已经结束的流直接丢弃 """
+        inbound = self.uploads.get(message.requestId)
+        if inbound is not None:
+            inbound.queue.put_nowait(message)
+
+    async def receive(self) -> str | bytes:
+        """ 接收一帧数据, 文本帧和二进制帧都可以 """
+        message = await self.ws.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        data = message.get("bytes")
+        if data is None:
+            data = message["text"]
+        if self.metrics is not None:
+            self.metrics.bytesIn += len(data)
+        return data
+
+    async def receiveModel(self, modelType: type[BaseModel] | TypeAdapter) -> BaseModel:
+        """ 接收并解码一条消息, 消息带有附件时继续接收附件帧 """
+        data = await self.receive()
+        start = time.perf_counter()
+        message = self.codec.decode(data, modelType)
+        self.decodeTime = time.perf_counter() - start
+        count = getattr(message, "attachments", 0)
+        if count:
+            # 附件帧紧随消息发送, 直接包装为 memoryview 不再复制
+            start = time.perf_counter()
+            attachAttachments(message, [memoryview(await self.receive()) for _ in range(count)])
+            self.receiveTime = time.perf_counter() - start
+        else:
+            self.receiveTime = 0.0
+        return message
+
+    async def _sendFrame(self, data: str | bytes) -> None:
+        if self.metrics is not None:
+            self.metrics.bytesOut += len(data)
+        if isinstance(data, bytes):
+            await self.ws.send_bytes(data)
+        else:
+            await self.ws.send_text(data)
+
+    async def send(self, model: BaseModel) -> tuple[float, float]:
+        """ 发送消息模型, 大的 bytes 作为附件帧紧随其后发送, 返回编码和写出 (包括等待发送锁) 的耗时(秒) """
+        encodeStart = time.perf_counter()
+        model, buffers = detachAttachments(model, self.attachmentThreshold, self.codec.nativeBytes)
+        data = self.codec.encode(model)
+        start = time.perf_counter()
+        encodeTime = start - encodeStart
+        async with self.sendLock:
+            await self._sendFrame(data)
+            for buffer in buffers: # 持有发送锁, 保证附件帧紧跟在消息之后
+                if self.metrics is not None:
+                    self.metrics.bytesOut += len(buffer)
+                await self.ws.send_bytes(buffer)
+        return encodeTime, time.perf_counter() - start
+
+    async def sendObject(self, obj: Any) -> None:
+        """ 发送普通对象 (例如握手阶段的状态字典) """
+        data = self.codec.dumps(obj)
+        async with self.sendLock:
+            await self._sendFrame(data)
+
+    async def drain(self) -> None:
+        """ 等待所有在途请求完成 """
+        if self.tasks:
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+    def cancel(self, requestId: int | None) -> None:
+        """ 客户端放弃了调用, 取消对应的任务 (包括它正在发送的流和接收的上传) """
+        task = self.tasks.get(requestId)
+        if task is not None:
+            task.cancel()
+
+    def abortStreams(self, reason: str) -> None:
+        """ 不再读取客户端的帧: 关闭所有发送中的流的信用门, 结束所有上传, 让等待信用或数据块的调用得以退出 """
+        for gate in list(self.streams.values()):
+            gate.close()
+        for inbound in list(self.uploads.values()):
+            inbound.queue.put_nowait(RpcStreamEnd(requestId=inbound.requestId, error=reason, IsError=True))
+
+    def cancelAll(self) -> None:
+        """ 取消所有在途请求 (连接已断开, 结果无人接收) """
+        for task in list(self.tasks.values()):
+            task.cancel()
@@ -0,0 +1,70 @@
+
+from ..Models import CallOptions
+from ..Utils.logger import getLogger
+from ..Utils.cache import ResultCache , cacheKey
+from .executor import CallExecutor , Invoker
+from typing import Any , Callable
+
+class DispatchTable:
+    """ 调度表, 注册时把每个可调用对象解析成直接调用器, 请求时只需一次字典查找 """
+    def __init__(self, executor: CallExecutor, call_items: dict[str, Callable] | None = None, call_options: dict[str, CallOptions] | None = None) -> None:
+        self.executor = executor
+        self.invokers: dict[str, Invoker] = {}
+        self.caches: dict[str, ResultCache] = {} # 开启了结果缓存的调用
+        self.logger = getLogger(self.__class__.__name__)
+        call_options = call_options or {}
+        for name, func in (call_items or {}).items():
+            self.register(name, func, call_options.get(name))
+
+    def register(self, name: str, func: Callable, options: CallOptions | None = None) -> None:
+        """ 编译并登记调用器 """
+        options = options or CallOptions()
+        invoker = self.executor.compile(func, options.policy)
+        self.caches.pop(name, None)
+        if options.cache is not None:
+            cache = self.caches[name] = ResultCache(options.cache.ttl, options.cache.maxEntries, options.cache.maxBytes)
+            invoker = self._cached(invoker, cache)
+        self.invokers[name] = invoker
+        self.logger.debug(f"Compiled invoker for {name}, policy: {options.policy}, cache: {options.cache}")
+
+    @staticmethod
+    def _cached(invoker: Invoker, cache: ResultCache) -> Invoker:
+        """ 在调用器外层加上结果缓存, 参数无法规范化时直接调用 """
+        async def invoke(args: tuple, kwargs: dict) -> Any:
+            key = cacheKey(args, kwargs)
+            if key is None:
+                return await invoker(args, kwargs)
+            return await cache.getOrCompute(key, lambda: invoker(args, kwargs))
+        invoke.__name__ = invoker.__name__
+        invoke.__wrapped__ = invoker.__wrapped__
+        return invoke
+
+    def unregister(self, name: str) -> None:
+        """ 移除调用器 """
+        self.invokers.pop(name, None)
+        self.caches.pop(name, None)
+
+    def invalidate(self, name: str, args: tuple | None = None, kwargs: dict | None = None) -> None:
+        """ 使缓存失效, 不指定参数时清空这个调用的全部缓存 """
+        cache = self.caches.get(name)
+        if cache is None:
+            return
+        if args is None and kwargs is None:
+            cache.invalidate()
+        else:
+            key = cacheKey(tuple(args or ()), kwargs or {})
+            if key is not None:
+                cache.invalidate(key)
+
+    def cacheStats(self) -> dict[str, dict]:
+        """ 每个调用的缓存命中统计 """
+        return {name: cache.stats() for name, cache in self.caches.items()}
+
+    def get(self, name: str) -> Invoker | None:
+        return self.invokers.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.invokers
+
+    def __len__(self) -> int:
+        return len(self.invokers)
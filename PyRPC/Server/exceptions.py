@@ -1,5 +1,15 @@
 
 
+from ..Models import ErrorCode
+
 class RPCServerError(RuntimeError):
     """ Base class for all RPC Server errors """
-    pass
\ No newline at end of file
+    code: ErrorCode | None = None # 返回给客户端的错误分类
+
+class RPCStreamAbortedError(RPCServerError):
+    """ 客户端中止了上传的流 """
+    pass
+
+class RPCDeadlineExceededError(RPCServerError):
+    """ 调用超过了请求携带的期限 """
+    code = ErrorCode.DEADLINE_EXCEEDED
@@ -0,0 +1,112 @@
+
+from ..Models import ExecutionPolicy
+from concurrent.futures import ThreadPoolExecutor , ProcessPoolExecutor
+from functools import partial
+from typing import Any , Callable , Awaitable , AsyncIterator , Iterator
+import asyncio
+import inspect
+
+Invoker = Callable[[tuple, dict], Awaitable[Any]] # 编译后的调用器: invoke(args, kwargs)
+_END = object() # 同步生成器结束的标记
+
+class CallExecutor:
+    """ 按照执行策略运行可调用对象, 避免阻塞事件循环 """
+    def __init__(self, threadWorkers: int | None = None, processWorkers: int | None = None) -> None:
+        self.threadWorkers = threadWorkers # 线程池大小, None 表示使用标准库默认值
+        self.processWorkers = processWorkers # 进程池大小, None 表示使用CPU核心数
+        self._threadPool: ThreadPoolExecutor | None = None
+        self._processPool: ProcessPoolExecutor | None = None
+
+    @property
+    def threadPool(self) -> ThreadPoolExecutor:
+        """ 延迟创建线程池 """
+        if self._threadPool is None:
+            self._threadPool = ThreadPoolExecutor(max_workers=self.threadWorkers, thread_name_prefix="PyRPC-Worker")
+        return self._threadPool
+
+    @property
+    def processPool(self) -> ProcessPoolExecutor:
+        """ 延迟创建进程池 """
+        if self._processPool is None:
+            self._processPool = ProcessPoolExecutor(max_workers=self.processWorkers)
+        return self._processPool
+
+    async def run(self, func: Callable, policy: ExecutionPolicy, *args, **kwargs) -> Any:
+        """ 执行函数, 协程函数总是直接在事件循环中等待 """
+        if inspect.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        if policy == ExecutionPolicy.THREAD:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.threadPool, partial(func, *args, **kwargs))
+        elif policy == ExecutionPolicy.PROCESS:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.processPool, partial(func, *args, **kwargs))
+        else:
+            result = func(*args, **kwargs)
+        if inspect.isawaitable(result): # 返回可等待对象的普通函数
+            result = await result
+        return result
+
+    def compile(self, func: Callable, policy: ExecutionPolicy = ExecutionPolicy.INLINE) -> Invoker:
+        """ 在注册时按函数类型和执行策略生成直接调用器, 请求路径上不再做任何判断 """
+        if inspect.iscoroutinefunction(func):
+            async def invoke(args: tuple, kwargs: dict) -> Any:
+                return await func(*args, **kwargs)
+        elif policy == ExecutionPolicy.THREAD or policy == ExecutionPolicy.PROCESS:
+            getPool = (lambda: self.threadPool) if policy == ExecutionPolicy.THREAD else (lambda: self.processPool)
+            async def invoke(args: tuple, kwargs: dict) -> Any:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(getPool(), partial(func, *args, **kwargs))
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+        else:
+            async def invoke(args: tuple, kwargs: dict) -> Any:
+                result = func(*args, **kwargs)
+                if inspect.isawaitable(result): # 返回可等待对象的普通函数
+                    result = await result
+                return result
+        invoke.__name__ = getattr(func, "__name__", invoke.__name__)
+        invoke.__wrapped__ = func
+        return invoke
+
+    async def iterate(self, items: Iterator | AsyncIterator, policy: ExecutionPolicy = ExecutionPolicy.INLINE) -> AsyncIterator:
+        """ 把生成器转换为异步迭代器, 同步生成器的每一步都按执行策略运行 """
+        if inspect.isasyncgen(items):
+            try:
+                async for item in items:
+                    yield item
+            finally:
+                await items.aclose()
+        elif policy == ExecutionPolicy.INLINE:
+            try:
+                for item in items:
+                    yield item
+            finally:
+                items.close()
+        else:
+            # 生成器对象不能跨进程传递, PROCESS 策略的生成器也在线程池中迭代
+            step = None
+            try:
+                while True:
+                    step = self.threadPool.submit(next, items, _END)
+                    item = await asyncio.wrap_future(step)
+                    if item is _END:
+                        break
+                    yield item
+            finally:
+                if step is None or step.done():
+                    items.close()
+                else:
+                    # 被取消时线程中的 next 仍在执行, 此时关闭会抛出 "generator already executing",
+                    # 所以等这一步结束后在工作线程中关闭, 不阻塞事件循环, 取消照常向上传递
+                    step.add_done_callback(lambda _: items.close())
+
+    def shutdown(self, wait: bool = True) -> None:
+        """ 关闭线程池和进程池 """
+        if self._threadPool is not None:
+            self._threadPool.shutdown(wait=wait)
+            self._threadPool = None
+        if self._processPool is not None:
+            self._processPool.shutdown(wait=wait)
+            self._processPool = None
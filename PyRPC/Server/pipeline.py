@@ -0,0 +1,65 @@
+
+from ..Interfaces import IRPCMiddleWare
+from ..Models import RpcRequest , RpcResponse , RpcBatchRequest , RpcBatchResponse , BatchResult , ErrorCode
+from .connection import RPCConnection
+from functools import partial
+from typing import Awaitable , Callable
+import time
+
+class CallContext:
+    """ 单次调用的上下文, 在逐调用中间件之间传递 """
+    __slots__ = ("connection", "request", "start", "state")
+
+    def __init__(self, connection: RPCConnection, request: RpcRequest | RpcBatchRequest) -> None:
+        self.connection = connection
+        self.request = request
+        self.start = time.perf_counter() # 进入调用链的时间
+        self.state: dict = {} # 中间件之间共享的数据
+
+    @property
+    def callitem(self) -> str | None:
+        """ 调用的函数名, 批量调用为 None """
+        return None if isinstance(self.request, RpcBatchRequest) else self.request.callbody.callitem
+
+    @property
+    def callitems(self) -> list[str]:
+        """ 这次调用涉及的所有函数名 """
+        if isinstance(self.request, RpcBatchRequest):
+            return [body.callitem for body in self.request.calls]
+        return [self.request.callbody.callitem]
+
+    @property
+    def identity(self) -> dict | None:
+        """ 连接认证通过的身份 """
+        return self.connection.identity
+
+    @property
+    def client(self):
+        """ 客户端地址 """
+        return self.connection.client
+
+    def reject(self, error: str, code: ErrorCode | None = None, retryAfter: float | None = None) -> RpcResponse | RpcBatchResponse:
+        """ 不执行调用, 直接返回错误响应 (按请求类型生成普通响应或批量响应) """
+        if isinstance(self.request, RpcBatchRequest):
+            results = [BatchResult(error=error, IsError=True, code=code, retryAfter=retryAfter) for _ in self.request.calls]
+            return RpcBatchResponse(requestId=self.request.requestId, results=results)
+        return RpcResponse(requestId=self.request.requestId, result=None, error=error, IsError=True, code=code, retryAfter=retryAfter)
+
+CallChain = Callable[[CallContext], Awaitable[RpcResponse | RpcBatchResponse]]
+
+def overrides(middleware: IRPCMiddleWare, hook: str) -> bool:
+    """ 中间件是否实现了某个钩子, 没有实现的钩子不进入调用链 """
+    return getattr(type(middleware), hook, None) is not getattr(IRPCMiddleWare, hook)
+
+def compileChain(middlewares: list[IRPCMiddleWare], terminal: CallChain) -> CallChain | None:
+    """
+    把实现了 around 的中间件按 sequence 编译成一条扁平的调用链, 最后一环是 terminal。
+    没有这样的中间件时返回 None, 服务器直接调用处理器, 不产生任何额外开销。
+    """
+    arounds = [middleware for middleware in sorted(middlewares, key=lambda m: m.sequence) if overrides(middleware, "around")]
+    if not arounds:
+        return None
+    chain = terminal
+    for middleware in reversed(arounds):
+        chain = partial(middleware.around, next=chain)
+    return chain
@@ -0,0 +1,84 @@
+
+from ..Interfaces import IRPCInstrument
+from ..Models import RpcRequest , PipelineStage , SlowCall
+from collections import Counter , deque
+import threading
+import time
+import sys
+
+class SlowCallRecorder(IRPCInstrument):
+    """
+    记录慢调用的插桩: 各阶段耗时之和超过 threshold 的调用连同逐阶段的耗时一起保留, 只保留最近的 capacity 条。
+    批量调用中的单个调用不会被记录。
+    """
+    def __init__(self, threshold: float = 0.5, capacity: int = 100) -> None:
+        self.threshold = threshold # 慢调用的阈值(秒)
+        self.calls: deque[SlowCall] = deque(maxlen=capacity)
+
+    def onCallEnd(self, request: RpcRequest, stages: dict[PipelineStage, float]) -> None:
+        elapsed = sum(stages.values())
+        if elapsed >= self.threshold:
+            self.calls.append(SlowCall(callitem=request.callbody.callitem, requestId=request.requestId,
+                                       elapsed=elapsed, stages=dict(stages), timestamp=time.time()))
+
+    def records(self) -> list[SlowCall]:
+        """ 最近的慢调用, 从旧到新 """
+        return list(self.calls)
+
+class SamplingProfiler:
+    """
+    采样分析器, 在独立的线程中按固定间隔读取进程内所有线程的调用栈。
+    不需要重启进程, 也不修改被分析的代码; 结果是 flamegraph.pl / speedscope 可以直接读取的折叠栈:
+
+    ```
+    MainThread;asyncio.base_events:BaseEventLoop.run_forever;...;app:handler 42
+    ```
+
+    同一时间只允许一次采样, 时长不超过 maxSeconds。
+    """
+    def __init__(self, maxSeconds: float = 60.0, minInterval: float = 0.001) -> None:
+        self.maxSeconds = maxSeconds # 单次采样的最长时间(秒)
+        self.minInterval = minInterval # 最短的采样间隔(秒), 间隔越短对被分析进程的影响越大
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def sample(self, seconds: float, interval: float = 0.005) -> Counter[str]:
+        """ 阻塞地采样 seconds 秒, 返回 折叠栈 -> 采样次数, 应当在线程中运行 """
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            seconds = min(max(seconds, 0.0), self.maxSeconds)
+            interval = max(interval, self.minInterval)
+            own = threading.get_ident() # 不采样自己
+            names: dict[int, str] = {}
+            counts: Counter[str] = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    if ident not in names: # 线程名只在出现新线程时重新读取
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    counts[self.collapse(frame, names.get(ident, str(ident)))] += 1
+                time.sleep(interval)
+            return counts
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def collapse(frame, thread: str) -> str:
+        """ 把调用栈折叠为一行, 从线程名开始, 各帧之间以分号分隔 """
+        stack = []
+        while frame is not None:
+            stack.append(f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}")
+            frame = frame.f_back
+        stack.append(thread.replace(";", ":"))
+        return ";".join(reversed(stack))
+
+    @staticmethod
+    def render(counts: Counter[str]) -> str:
+        """ 每行一个折叠栈和它的采样次数 """
+        return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,111 @@
+
+from ..Interfaces import IRemoteCallable
+from ..Models import CallOptions , CallableCheckResponse
+from ..Utils.logger import getLogger
+from .dispatch import DispatchTable
+from .executor import CallExecutor
+from typing import Any , Callable , get_origin
+import hashlib
+import inspect
+import json
+
+def typeName(annotation: Any) -> str:
+    """ 注解的可读名称, 支持字符串注解和泛型 (例如 list[int]) """
+    if annotation is inspect.Parameter.empty or annotation is inspect.Signature.empty:
+        return "Any"
+    if isinstance(annotation, str):
+        return annotation
+    if get_origin(annotation) is not None: # list[int], dict[str, int], Optional[int] ...
+        return str(annotation).replace("typing.", "")
+    name = getattr(annotation, "__name__", None)
+    return name if name is not None else str(annotation).replace("typing.", "")
+
+def describe(name: str, func: Callable, options: CallOptions | None = None) -> CallableCheckResponse:
+    """ 生成单个可调用对象的元数据, 只在注册时执行一次 """
+    try:
+        signature = inspect.signature(func)
+        parameters, returnType = signature.parameters, signature.return_annotation
+    except (TypeError, ValueError): # 部分内置函数没有签名
+        parameters, returnType = {}, inspect.Signature.empty
+    pInfo = [{"name": k, "type": typeName(p.annotation)} for k, p in parameters.items()]
+    pDictInfo = {k: typeName(p.annotation) for k, p in parameters.items()}
+    cache = options.cache if options is not None else None
+    return CallableCheckResponse(callName=name, requireArgs=tuple(pInfo), requireKwargs=pDictInfo, returnType=typeName(returnType),
+                                 cacheable=cache is not None, cacheTTL=cache.ttl if cache is not None else None,
+                                 idempotent=options is not None and options.idempotent)
+
+class CallRegistry:
+    """
+    可调用对象注册表, 注册和注销时增量更新调度表和元数据索引。
+    每次变化版本号加一, 客户端可以通过 ETag 低成本地检测变化;
+    ETag 由目录内容计算, 注册了相同函数的多个 worker 给出相同的 ETag。
+    """
+    def __init__(self, executor: CallExecutor) -> None:
+        self.callitems: dict[str, Callable] = {} # 调用名 -> 函数, 处理器共享这个字典
+        self.calloptions: dict[str, CallOptions] = {}
+        self.owners: dict[str, str] = {} # 调用名 -> 所属的 RemoteCallable 名称
+        self.infos: dict[str, CallableCheckResponse] = {} # 调用名 -> 元数据
+        self.dispatchTable = DispatchTable(executor)
+        self.version = 0
+        self._catalogue: list[dict] | None = None # 按版本缓存的目录
+        self._etag = ""
+        self._catalogueVersion = -1
+        self.logger = getLogger(self.__class__.__name__)
+
+    @property
+    def etag(self) -> str:
+        self.catalogue()
+        return self._etag
+
+    def addCallItem(self, item: IRemoteCallable) -> None:
+        """ 登记 RemoteCallable 的所有函数, 并订阅之后的注册和注销 """
+        for name, func in item.callitems.items():
+            self.register(name, func, item.calloptions.get(name), item.name)
+        if hasattr(item, "addListener"):
+            item.addListener(self._onChange)
+
+    def removeCallItem(self, item: IRemoteCallable) -> None:
+        """ 移除 RemoteCallable 登记的所有函数 """
+        if hasattr(item, "removeListener"):
+            item.removeListener(self._onChange)
+        for name in [name for name, owner in self.owners.items() if owner == item.name]:
+            self.unregister(name)
+
+    def _onChange(self, item: IRemoteCallable, name: str, func: Callable | None, options: CallOptions | None) -> None:
+        if func is None:
+            if self.owners.get(name) == item.name: # 同名函数可能已经被其他 RemoteCallable 覆盖
+                self.unregister(name)
+        else:
+            self.register(name, func, options, item.name)
+
+    def register(self, name: str, func: Callable, options: CallOptions | None = None, owner: str | None = None) -> None:
+        """ 登记或替换单个函数 """
+        if name in self.callitems and self.owners.get(name) != owner:
+            self.logger.warning(f"Call {name} already registered by {self.owners.get(name)}, overwriting")
+        options = options or CallOptions()
+        self.dispatchTable.register(name, func, options)
+        self.callitems[name] = func
+        self.calloptions[name] = options
+        self.owners[name] = owner
+        self.infos[name] = describe(name, func, options)
+        self.version += 1
+
+    def unregister(self, name: str) -> None:
+        """ 注销单个函数 """
+        if name not in self.callitems:
+            return
+        self.dispatchTable.unregister(name)
+        del self.callitems[name]
+        self.calloptions.pop(name, None)
+        self.owners.pop(name, None)
+        self.infos.pop(name, None)
+        self.version += 1
+
+    def catalogue(self) -> list[dict]:
+        """ 可调用对象目录 (JSON 可序列化, 按名称排序), 版本不变时直接返回缓存 """
+        if self._catalogueVersion != self.version:
+            self._catalogue = [self.infos[name].model_dump(mode="json") for name in sorted(self.infos)]
+            digest = hashlib.blake2b(json.dumps(self._catalogue, sort_keys=True).encode(), digest_size=8).hexdigest()
+            self._etag = f'"{digest}"'
+            self._catalogueVersion = self.version
+        return self._catalogue
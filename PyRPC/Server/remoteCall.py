@@ -1,21 +1,68 @@
 
 from ..Interfaces import IRemoteCallable
+from ..Models import CallOptions , CachePolicy , ExecutionPolicy
+from ..Utils.logger import getLogger
 from typing import Callable
-from functools import wraps
+import inspect
 
 class RemoteCallable(IRemoteCallable):
     """ 远程调用类 """
     def __init__(self) -> None:
         self.name = self.__class__.__name__
         self.callitems = {}
+        self.calloptions: dict[str, CallOptions] = {}
+        self.listeners: list[Callable] = [] # 注册和注销时通知 (例如服务器的调用注册表)
+        self.logger = getLogger(self.__class__.__name__)
         super().__init__(name=self.name)
 
-    def registerCall(self, func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            return func(*args, **kwargs)
-        self.callitems[func.__name__] = wrapper
-        return wrapper
+    def registerCall(self, func: Callable | None = None, *, policy: ExecutionPolicy = ExecutionPolicy.INLINE,
+                     cache: CachePolicy | float | None = None, idempotent: bool = False,
+                     concurrency: int | None = None, queue: int = 0) -> Callable:
+        """
+        注册远程调用函数, 可以直接作为装饰器使用, 也可以指定执行策略和结果缓存:
+
+        ```
+        @rpc.registerCall(policy=ExecutionPolicy.THREAD)
+        def query(sql: str) -> list: ...
+
+        @rpc.registerCall(cache=CachePolicy(ttl=30, maxEntries=10000)) # cache=30 等价于只指定 ttl
+        def lookup(key: str) -> dict: ...
+        ```
+
+        开启缓存或标记为幂等 (idempotent=True) 的调用, 客户端也可以在本地缓存结果。
+        concurrency 限制同时执行的调用数, 超出 queue 个排队的调用按过载拒绝。
+        """
+        if func is None:
+            return lambda f: self.registerCall(f, policy=policy, cache=cache, idempotent=idempotent, concurrency=concurrency, queue=queue)
+        if isinstance(cache, (int, float)):
+            cache = CachePolicy(ttl=cache)
+        if cache is not None and (inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func)):
+            self.logger.warning(f"{func.__name__} is a generator function, its results will not be cached")
+            cache = None
+        if inspect.iscoroutinefunction(func) and policy != ExecutionPolicy.INLINE:
+            self.logger.warning(f"{func.__name__} is a coroutine function, it will be awaited on the event loop instead of {policy}")
+            policy = ExecutionPolicy.INLINE
+        if inspect.isgeneratorfunction(func) and policy == ExecutionPolicy.PROCESS:
+            self.logger.warning(f"{func.__name__} is a generator function, generators cannot cross processes, it will be iterated in the thread pool")
+            policy = ExecutionPolicy.THREAD
+        self.callitems[func.__name__] = func # 直接登记原函数, 不再额外包装一层
+        self.calloptions[func.__name__] = CallOptions(policy=policy, cache=cache, idempotent=idempotent,
+                                                     concurrency=concurrency, queue=queue)
+        self._notify(func.__name__, func, self.calloptions[func.__name__])
+        return func
+
+    def addListener(self, listener: Callable) -> None:
+        """ 订阅注册和注销: listener(item, name, func, options), 注销时 func 和 options 为 None """
+        if listener not in self.listeners:
+            self.listeners.append(listener)
+
+    def removeListener(self, listener: Callable) -> None:
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def _notify(self, name: str, func: Callable | None, options: CallOptions | None) -> None:
+        for listener in self.listeners:
+            listener(self, name, func, options)
 
     def call(self, name: str, *args, **kwargs) -> object:
         if name in self.callitems:
@@ -32,6 +79,8 @@ class RemoteCallable(IRemoteCallable):
     def unregisterCall(self, name: str) -> None:
         if name in self.callitems:
             del self.callitems[name]
+            self.calloptions.pop(name, None)
+            self._notify(name, None, None)
 
     def get_all_callables(self) -> list[Callable]:
         return list(self.callitems.values())
\ No newline at end of file
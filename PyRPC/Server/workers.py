@@ -0,0 +1,43 @@
+
+from uvicorn.importer import import_from_string
+from typing import Callable , TYPE_CHECKING
+import os
+
+if TYPE_CHECKING:
+    from .backend import RPCServer
+
+FACTORY_ENV = "PYRPC_SERVER_FACTORY" # 主进程通过环境变量把服务器工厂的导入路径传给工作进程
+APP_FACTORY = "PyRPC.Server.workers:createApp" # uvicorn 在每个工作进程中调用的应用工厂
+
+ServerFactory = Callable[[], "RPCServer"]
+
+def factoryPath(factory: str | ServerFactory) -> str:
+    """
+    把服务器工厂转换为 "module:attr" 形式的导入路径。
+    工作进程是重新启动的解释器, 只能通过导入路径重建注册表, 不能接收主进程中的对象。
+    """
+    if isinstance(factory, str):
+        if ":" not in factory:
+            raise ValueError(f"Server factory must be an import path like 'module:build', got {factory!r}")
+        return factory
+    module = getattr(factory, "__module__", None)
+    qualname = getattr(factory, "__qualname__", "")
+    if module is None or "<" in qualname: # lambda 和嵌套函数无法在其他进程中导入
+        raise ValueError(f"Server factory {factory!r} is not importable, define it at module level")
+    return f"{module}:{qualname}"
+
+def loadServer(path: str) -> "RPCServer":
+    """ 导入服务器工厂并创建服务器, 导入路径也可以直接指向一个 RPCServer 实例 """
+    from .backend import RPCServer
+    target = import_from_string(path)
+    server = target if isinstance(target, RPCServer) else target()
+    if not isinstance(server, RPCServer):
+        raise TypeError(f"Server factory {path} returned {type(server).__name__}, expected RPCServer")
+    return server
+
+def createApp():
+    """ uvicorn 工作进程的应用工厂, 每个工作进程独立重建注册表、调度表和线程池 """
+    path = os.environ.get(FACTORY_ENV)
+    if not path:
+        raise RuntimeError(f"{FACTORY_ENV} is not set, start workers with RPCServer.run(workers=N, factory=...)")
+    return loadServer(path).prepare()
@@ -1,4 +1,8 @@
 
 from .excformat import ExtractException
+from .logger import getLogger , setLevel , isEnabledFor , AccessLogger
+from .flow import CreditGate , ThreadCreditGate
+from .cache import ResultCache , cacheKey
 
-__all__ = ['ExtractException']
\ No newline at end of file
+__all__ = ['ExtractException', 'getLogger', 'setLevel', 'isEnabledFor', 'AccessLogger', 'CreditGate', 'ThreadCreditGate',
+           'ResultCache', 'cacheKey']
\ No newline at end of file
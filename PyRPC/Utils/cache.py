@@ -0,0 +1,136 @@
+
+from collections import OrderedDict
+from datetime import date , datetime
+from typing import Any , Awaitable , Callable
+import asyncio
+import hashlib
+import json
+import sys
+import time
+
+def _canonical(obj: Any) -> Any:
+    """ json 不能直接表示的参数类型, 无法稳定表示的类型不缓存 """
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return {"$bytes": hashlib.blake2b(obj, digest_size=16).hexdigest()}
+    if isinstance(obj, (set, frozenset)):
+        return {"$set": sorted(json.dumps(item, sort_keys=True, default=_canonical) for item in obj)}
+    if isinstance(obj, (datetime, date)):
+        return {"$datetime": obj.isoformat()}
+    raise TypeError(f"Object of type {type(obj).__name__} has no canonical form")
+
+def cacheKey(args: tuple, kwargs: dict) -> bytes | None:
+    """ 参数的规范化哈希, 关键字参数与顺序无关; 参数无法规范化时返回 None (不缓存) """
+    try:
+        payload = json.dumps([args, kwargs], sort_keys=True, separators=(",", ":"), default=_canonical)
+    except (TypeError, ValueError):
+        return None
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+def _sizeOf(value: Any) -> int:
+    """ 粗略估计结果占用的字节数, 只展开一层容器 """
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    return size
+
+class ResultCache:
+    """
+    调用结果缓存: TTL 过期, 按条目数和字节数限制, LRU 淘汰。
+    相同参数的并发未命中只执行一次, 其他调用等待同一个结果。
+    """
+    def __init__(self, ttl: float | None = None, maxEntries: int = 10000, maxBytes: int | None = None) -> None:
+        self.ttl = ttl # 过期时间(秒), None 表示不过期
+        self.maxEntries = maxEntries
+        self.maxBytes = maxBytes # None 表示不限制字节数
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0 # 等待其他调用结果的次数
+        self.evictions = 0
+        self._entries: OrderedDict[bytes, tuple[float | None, Any, int]] = OrderedDict() # key -> (过期时间, 结果, 字节数)
+        self._inflight: dict[bytes, asyncio.Future] = {}
+        self._generation = 0 # 每次失效加一, 失效之前开始的调用结果不再写入
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> tuple[bool, Any]:
+        """ 查找缓存, 返回 (是否命中, 结果) """
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires, value, _ = entry
+        if expires is not None and expires <= time.monotonic():
+            self._remove(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def put(self, key: bytes, value: Any) -> None:
+        """ 写入缓存, 超出限制时淘汰最久未使用的条目 """
+        size = _sizeOf(value) if self.maxBytes is not None else 0
+        if self.maxBytes is not None and size > self.maxBytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        self._entries[key] = (expires, value, size)
+        self.bytes += size
+        while len(self._entries) > self.maxEntries or (self.maxBytes is not None and self.bytes > self.maxBytes):
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def _remove(self, key: bytes) -> None:
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def invalidate(self, key: bytes | None = None) -> None:
+        """ 使某个条目失效, 不指定时清空整个缓存 """
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+            self.bytes = 0
+        elif key in self._entries:
+            self._remove(key)
+
+    async def getOrCompute(self, key: bytes, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """ 命中时直接返回, 未命中时执行 compute, 相同的并发未命中共享一次执行 """
+        hit, value = self.get(key)
+        if hit:
+            self.hits += 1
+            return value
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                if not inflight.cancelled():
+                    raise
+                return await compute() # 先发起的调用被取消了, 自己执行
+        self.misses += 1
+        generation = self._generation
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception() # 没有等待者时避免 "exception was never retrieved"
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        if generation == self._generation:
+            self.put(key, value)
+        future.set_result(value)
+        return value
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "evictions": self.evictions,
+                "entries": len(self._entries), "bytes": self.bytes}
@@ -0,0 +1,54 @@
+
+import asyncio
+import threading
+
+class CreditGate:
+    """ 基于信用的流量控制, 发送方每发送一个数据块消耗一个信用, 信用用完时等待接收方授予 """
+    def __init__(self, credit: int = 0) -> None:
+        self.credit = credit
+        self.closed = False # 接收方关闭了这个流, 或者调用已经结束
+        self._event = asyncio.Event()
+
+    def grant(self, credit: int) -> None:
+        self.credit += credit
+        self._event.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self._event.set()
+
+    async def acquire(self) -> bool:
+        """ 获取一个信用, 流被关闭时返回 False """
+        while self.credit <= 0 and not self.closed:
+            self._event.clear()
+            await self._event.wait()
+        if self.closed:
+            return False
+        self.credit -= 1
+        return True
+
+class ThreadCreditGate:
+    """ CreditGate 的线程版本, 供同步客户端在调用线程或上传线程中使用 """
+    def __init__(self, credit: int = 0) -> None:
+        self.credit = credit
+        self.closed = False
+        self._cond = threading.Condition()
+
+    def grant(self, credit: int) -> None:
+        with self._cond:
+            self.credit += credit
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def acquire(self) -> bool:
+        """ 获取一个信用, 流被关闭时返回 False """
+        with self._cond:
+            self._cond.wait_for(lambda: self.credit > 0 or self.closed)
+            if self.closed:
+                return False
+            self.credit -= 1
+            return True
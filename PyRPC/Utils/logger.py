@@ -1,13 +1,67 @@
 
 from loguru import logger
 import sys
+import random
 
 logger.remove() # 移除默认的日志处理器
 
 logFmt = "<lvl>{time:YYYY-MM-DD HH:mm:ss.SSS} | {level:<8} | {name}.{function} | {file}:{line} | {message}</lvl>"
 
-logger.add(sys.stderr, format=logFmt, level="INFO", enqueue=True)
+_levelName = "INFO" # 当前生效的日志级别
+_levelNos = {level.name: level.no for level in (logger.level(name) for name in ("TRACE", "DEBUG", "INFO", "SUCCESS", "WARNING", "ERROR", "CRITICAL"))}
+_levelNo = _levelNos[_levelName]
+_handlerId = logger.add(sys.stderr, format=logFmt, level=_levelName, enqueue=True)
 
 def getLogger(name: str, level: str = "INFO"):
-    
-    return logger.bind(name=name, level=level)
\ No newline at end of file
+    """
+    获取日志记录器, 热路径上的日志应当避免提前格式化消息:
+
+    ```
+    if isEnabledFor("DEBUG"): # 级别守卫, 被过滤时完全不产生开销
+        log.debug(f"Received request: {req}")
+    log.opt(lazy=True).debug("Received request: {}", lambda: req.model_dump()) # 延迟求值
+    ```
+    """
+    return logger.bind(name=name, level=level)
+
+def setLevel(level: str) -> None:
+    """ 修改全局日志级别 """
+    global _handlerId, _levelName, _levelNo
+    levelNo = logger.level(level).no
+    logger.remove(_handlerId)
+    _handlerId = logger.add(sys.stderr, format=logFmt, level=level, enqueue=True)
+    _levelNos.setdefault(level, levelNo)
+    _levelName, _levelNo = level, levelNo
+
+def getLevel() -> str:
+    """ 当前生效的日志级别 """
+    return _levelName
+
+def isEnabledFor(level: str) -> bool:
+    """ 级别守卫, 判断该级别的日志是否会被输出 """
+    levelNo = _levelNos.get(level)
+    if levelNo is None:
+        levelNo = _levelNos[level] = logger.level(level).no
+    return levelNo >= _levelNo
+
+class AccessLogger:
+    """
+    采样访问日志, 生产环境中只记录一部分调用。
+    出错的调用和超过慢调用阈值的调用总是会被记录。
+    """
+    def __init__(self, sampleRate: float = 0.0, slowThreshold: float | None = None) -> None:
+        self.sampleRate = sampleRate # 采样比例, 0 表示不记录正常调用, 1 表示全部记录
+        self.slowThreshold = slowThreshold # 慢调用阈值(秒), None 表示不判断
+        self.logger = getLogger(self.__class__.__name__)
+
+    def log(self, client, callitem: str, elapsed: float, isError: bool) -> None:
+        """ 记录一次调用 """
+        if isError:
+            if isEnabledFor("WARNING"):
+                self.logger.warning(f"{client} {callitem} ERROR {elapsed * 1000:.3f}ms")
+        elif self.slowThreshold is not None and elapsed >= self.slowThreshold:
+            if isEnabledFor("WARNING"):
+                self.logger.warning(f"{client} {callitem} SLOW {elapsed * 1000:.3f}ms")
+        elif self.sampleRate > 0 and (self.sampleRate >= 1 or random.random() < self.sampleRate):
+            if isEnabledFor("INFO"):
+                self.logger.info(f"{client} {callitem} OK {elapsed * 1000:.3f}ms")